@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+
+from detectem.settings import MATCH_CACHE_DIR, MATCH_CACHE_MAX_BYTES, MATCH_CACHE_SIZE
+
+logger = logging.getLogger("detectem")
+
+
+class MatchCache:
+    """Cache of match results keyed by a content address.
+
+    Results are kept in a bounded LRU dictionary and, if ``directory``
+    is provided, also in an on-disk store shared by every process.
+    The on-disk store is trimmed to ``max_bytes`` removing the least
+    recently used files.
+
+    Values must be serializable to JSON.
+
+    """
+
+    def __init__(self, max_entries, directory=None, max_bytes=MATCH_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        self._data = OrderedDict()
+        self._disk_bytes = None
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._data)
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _get_from_disk(self, key):
+        path = self._get_path(key)
+
+        try:
+            with open(path) as f:
+                value = json.load(f)
+            # Mark it as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        return value
+
+    def _set_to_disk(self, key, value):
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with open(fd, "w") as f:
+                json.dump(value, f)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, self._get_path(key))
+        except OSError as e:
+            logger.warning(f"[-] Could not write to match cache: {e}")
+            return
+
+        if self._disk_bytes is None:
+            self._disk_bytes = self._get_disk_usage()[1]
+        else:
+            self._disk_bytes += size
+
+        if self._disk_bytes > self.max_bytes:
+            self._evict_from_disk()
+
+    def _get_disk_usage(self):
+        """ Return list of ``(mtime, size, path)`` of stored files and total size. """
+        files = []
+
+        with os.scandir(self.directory) as it:
+            for f in it:
+                if f.is_file() and not f.name.endswith(".tmp"):
+                    st = f.stat()
+                    files.append((st.st_mtime, st.st_size, f.path))
+
+        return files, sum(size for _, size, _ in files)
+
+    def _evict_from_disk(self):
+        """ Remove least recently used files until the store fits in ``max_bytes``. """
+        files, total = self._get_disk_usage()
+
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:
+                # Removed by other process
+                pass
+
+            total -= size
+
+        self._disk_bytes = total
+
+    def get(self, key):
+        """ Return the value of ``key`` or ``None`` if it's not cached. """
+        try:
+            value = self._data[key]
+            self._data.move_to_end(key)
+        except KeyError:
+            value = self._get_from_disk(key) if self.directory else None
+            if value is None:
+                self.misses += 1
+                return None
+
+            self._set_in_memory(key, value)
+
+        self.hits += 1
+        return value
+
+    def _set_in_memory(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def set(self, key, value):
+        self._set_in_memory(key, value)
+
+        if self.directory:
+            self._set_to_disk(key, value)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+
+_match_cache = None
+
+
+def get_match_cache():
+    """Return the match cache of the current process.
+
+    Return ``None`` if it's disabled with ``MATCH_CACHE_SIZE=0``.
+
+    """
+    global _match_cache
+
+    if not MATCH_CACHE_SIZE:
+        return None
+
+    if _match_cache is None:
+        _match_cache = MatchCache(MATCH_CACHE_SIZE, directory=MATCH_CACHE_DIR)
+
+    return _match_cache
@@ -10,9 +10,11 @@ from urllib.parse import urlparse
 import click
 import click_log
 
+from detectem.cache import get_match_cache
 from detectem.core import Detector
 from detectem.exceptions import DockerStartError, NoPluginsError, SplashError
-from detectem.plugin import load_plugins
+from detectem.plugin import PLUGIN_TAGS, load_plugins
+from detectem.profiling import MatcherProfiler
 from detectem.response import get_response
 from detectem.settings import (
     CMD_OUTPUT,
@@ -22,7 +24,7 @@ from detectem.settings import (
     SPLASH_TIMEOUT,
 )
 from detectem.splash import get_splash_manager
-from detectem.utils import create_printer
+from detectem.utils import create_printer, is_response_body_decoded, split_values
 
 # Set up logging
 logger = logging.getLogger("detectem")
@@ -33,6 +35,11 @@ click_log.basic_config(logger)
 TaskItem = namedtuple("TaskItem", ["args", "retries"])
 
 
+def split_option(ctx, param, value):
+    """ Return list of values of a comma separated option. """
+    return split_values(value)
+
+
 @click.command()
 @click.option(
     "--timeout",
@@ -55,9 +62,38 @@ TaskItem = namedtuple("TaskItem", ["args", "retries"])
 @click.option("--list-plugins", is_flag=True, help="List registered plugins")
 @click.option("--save-har", is_flag=True, help="Save har to file")
 @click.option("-i", "--input-file", type=click.File("r"), help="Read URLs from file")
+@click.option(
+    "--plugins",
+    "plugin_names",
+    callback=split_option,
+    help="Comma separated list of plugins to use.",
+)
+@click.option(
+    "--tags",
+    callback=split_option,
+    help="Comma separated list of tags of plugins to use ({}).".format(
+        ", ".join(PLUGIN_TAGS)
+    ),
+)
+@click.option(
+    "--profile-matchers",
+    is_flag=True,
+    help="Print a JSON report of matchers cost to stderr.",
+)
 @click_log.simple_verbosity_option(logger, default="error")
 @click.argument("input_url", required=False)
-def main(timeout, format, metadata, list_plugins, save_har, input_file, input_url):
+def main(
+    timeout,
+    format,
+    metadata,
+    list_plugins,
+    save_har,
+    input_file,
+    plugin_names,
+    tags,
+    profile_matchers,
+    input_url,
+):
     # Gather urls
     urls = []
     if input_file:
@@ -76,20 +112,33 @@ def main(timeout, format, metadata, list_plugins, save_har, input_file, input_ur
         click.echo(click.get_current_context().get_help())
         sys.exit(1)
 
+    # Build the plugin registry before forking so workers share it
+    plugins = load_plugins()
+
+    invalid = get_invalid_filter(plugin_names, tags)
+    if invalid:
+        option, message = invalid
+        raise click.BadParameter(message, param_hint=option)
+
     printer = create_printer(format)
 
     # --list-plugins option
     if list_plugins:
         try:
-            printer(get_plugins(metadata))
+            printer(get_plugins(metadata, plugin_names, tags))
         except NoPluginsError as e:
             printer(str(e))
         finally:
             sys.exit(1)
 
+    # Build the filtered registry before forking as well
+    if plugin_names or tags:
+        plugins.filter(plugin_names, tags)
+
     # Create queues
     task_queue = Queue()
     result_queue = Queue()
+    profile_queue = Queue() if profile_matchers else None
 
     # Init splash manager
     splash_manager = get_splash_manager()
@@ -115,7 +164,14 @@ def main(timeout, format, metadata, list_plugins, save_har, input_file, input_ur
     processes = [
         Process(
             target=process_url_worker,
-            args=(splash_manager, task_queue, result_queue),
+            args=(
+                splash_manager,
+                task_queue,
+                result_queue,
+                plugin_names,
+                tags,
+                profile_queue,
+            ),
         )
         for _ in range(n_available_instances)
     ]
@@ -140,11 +196,27 @@ def main(timeout, format, metadata, list_plugins, save_har, input_file, input_ur
 
     printer(results)
 
+    # Aggregate matcher profiles of every worker
+    if profile_queue:
+        profiler = MatcherProfiler()
+        while not profile_queue.empty():
+            profiler.merge(profile_queue.get())
+
+        click.echo(json.dumps(profiler.get_report(), indent=2), err=True)
+
     splash_manager.teardown()
 
 
-def process_url_worker(splash_manager, task_queue, result_queue):
+def process_url_worker(
+    splash_manager,
+    task_queue,
+    result_queue,
+    plugin_names=None,
+    tags=None,
+    profile_queue=None,
+):
     process_name = current_process().name
+    profiler = MatcherProfiler() if profile_queue else None
 
     with splash_manager.sem:
         task_item: TaskItem
@@ -162,7 +234,12 @@ def process_url_worker(splash_manager, task_queue, result_queue):
                 )
 
                 try:
-                    result = get_detection_results(*args + [splash_url])
+                    result = get_detection_results(
+                        *args + [splash_url],
+                        plugin_names=plugin_names,
+                        tags=tags,
+                        profiler=profiler,
+                    )
                 except SplashError as e:
                     # Handle limit of retries
                     retries = task_item.retries + 1
@@ -188,6 +265,15 @@ def process_url_worker(splash_manager, task_queue, result_queue):
                 # Finish if there aren't any more tasks in the queue
                 if task_queue.empty():
                     logger.info(f"[+] Processing is done @ {process_name}")
+
+                    match_cache = get_match_cache()
+                    if match_cache:
+                        logger.info(
+                            f"[+] Match cache @ {process_name}: {match_cache.stats()}"
+                        )
+
+                    if profiler:
+                        profile_queue.put(profiler.get_stats())
                     return
 
 
@@ -197,22 +283,30 @@ def get_detection_results(
     metadata=False,
     save_har=False,
     splash_url="",
+    plugin_names=None,
+    tags=None,
+    profiler=None,
 ):
     """Return results from detector.
 
     This function prepares the environment loading the plugins,
     getting the response and passing it to the detector.
 
+    If ``plugin_names`` or ``tags`` are provided,
+    only the plugins with these names or tags are used.
+
+    If ``profiler`` is provided, matchers cost is recorded on it.
+
     In case of errors, it raises exceptions to be handled externally.
 
     """
-    plugins = load_plugins()
+    plugins = get_plugin_collection(plugin_names, tags)
     if not plugins:
         raise NoPluginsError("No plugins found")
 
     logger.debug("[+] Starting detection with %(n)d plugins", {"n": len(plugins)})
 
-    response = get_response(url, plugins, timeout, splash_url)
+    response = get_response(url, plugins, timeout, splash_url, full_har=save_har)
 
     # Save HAR
     if save_har:
@@ -220,22 +314,63 @@ def get_detection_results(
         logger.info(f"Saving HAR file to {path}")
 
         with open(fd, "w") as f:
-            json.dump(response["har"], f)
-
-    det = Detector(response, plugins, url)
+            # Remove detectem metadata, it isn't part of the HAR format
+            har = [
+                {k: v for k, v in entry.items() if k != "detectem"}
+                for entry in response["har"]
+            ]
+            json.dump(har, f)
+
+    match_cache = get_match_cache()
+    det = Detector(response, plugins, url, match_cache=match_cache, profiler=profiler)
     softwares = det.get_results(metadata=metadata)
 
+    if match_cache:
+        logger.debug(f"[+] Match cache stats: {match_cache.stats()}")
+
+    n_encoded = sum(not is_response_body_decoded(e) for e in response["har"])
+    logger.debug(
+        f"[+] Response bodies never decoded to text: {n_encoded}/{len(response['har'])}"
+    )
+
     output = {"url": url, "softwares": softwares}
 
     return output
 
 
-def get_plugins(metadata):
-    """Return the registered plugins.
+def get_invalid_filter(plugin_names=None, tags=None):
+    """Return ``(option, message)`` of the first invalid value
+    of ``plugin_names`` or ``tags``, or ``None`` if every value is valid.
 
-    Load and return all registered plugins.
     """
+    for tag in tags or []:
+        if tag not in PLUGIN_TAGS:
+            return "--tags", f"Invalid tag: {tag}"
+
     plugins = load_plugins()
+    for name in plugin_names or []:
+        if not plugins.get(name):
+            return "--plugins", f"Invalid plugin: {name}"
+
+    return None
+
+
+def get_plugin_collection(plugin_names=None, tags=None):
+    """ Return the registered plugins filtered by ``plugin_names`` and ``tags``. """
+    plugins = load_plugins()
+    if plugin_names or tags:
+        plugins = plugins.filter(plugin_names, tags)
+
+    return plugins
+
+
+def get_plugins(metadata, plugin_names=None, tags=None):
+    """Return the registered plugins.
+
+    Load and return all registered plugins
+    (or the ones with ``plugin_names`` or ``tags``).
+    """
+    plugins = get_plugin_collection(plugin_names, tags)
     if not plugins:
         raise NoPluginsError("No plugins found")
 
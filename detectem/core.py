@@ -1,7 +1,9 @@
+import hashlib
 import logging
 import urllib.parse
 
-from detectem.matchers import BodyMatcher, HeaderMatcher, UrlMatcher, XPathMatcher
+from detectem.matchers import PluginMatch, is_over_budget
+from detectem.profiling import BODY_PREFILTER, FILE_HASH_INDEX, NULL_MEASURE, URL_ENGINE
 from detectem.results import Result, ResultCollection
 from detectem.settings import (
     GENERIC_TYPE,
@@ -11,15 +13,16 @@ from detectem.settings import (
     MAIN_ENTRY,
     RESOURCE_ENTRY,
 )
-from detectem.utils import get_most_complete_pm, get_url, get_version_via_file_hashes
+from detectem.utils import (
+    get_ascii_response_body,
+    get_most_complete_pm,
+    get_response_body,
+    get_response_body_hash,
+    get_response_headers,
+    get_url,
+)
 
 logger = logging.getLogger("detectem")
-MATCHERS = {
-    "url": UrlMatcher(),
-    "body": BodyMatcher(),
-    "header": HeaderMatcher(),
-    "xpath": XPathMatcher(),
-}
 
 
 class HarProcessor:
@@ -35,11 +38,9 @@ class HarProcessor:
     @staticmethod
     def _get_location(entry):
         """ Return `Location` header value if it's present in ``entry`` """
-        headers = entry["response"].get("headers", [])
-
-        for header in headers:
-            if header["name"] == "Location":
-                return header["value"]
+        values = get_response_headers(entry).get("location")
+        if values:
+            return values[0]
 
         return None
 
@@ -96,13 +97,35 @@ class HarProcessor:
 
 
 class Detector:
-    def __init__(self, response, plugins, requested_url):
+    def __init__(
+        self, response, plugins, requested_url, match_cache=None, profiler=None
+    ):
         self.requested_url = requested_url
         self.har = HarProcessor().prepare(response, requested_url)
 
         self._softwares_from_splash = response["softwares"]
         self._plugins = plugins
         self._results = ResultCollection()
+        self._match_cache = match_cache
+        self._profiler = profiler
+
+        if plugins is not None:
+            self._url_engine = plugins.get_url_engine()
+            self._body_prefilter = plugins.get_body_prefilter()
+            self._file_hash_index = plugins.get_file_hash_index()
+            self._matcher_plans = plugins.get_matcher_plans()
+            self._router = plugins.get_entry_router()
+
+        # Plugin evaluations avoided by the router, used for debugging
+        self._n_evaluations = 0
+        self._n_avoided_evaluations = 0
+
+    def _measure(self, plugin_name, matcher_type, entry):
+        """ Return context manager to profile a matcher if profiling is enabled. """
+        if self._profiler is None:
+            return NULL_MEASURE
+
+        return self._profiler.measure(plugin_name, matcher_type, entry)
 
     @staticmethod
     def _get_entry_type(entry):
@@ -126,7 +149,7 @@ class Detector:
                 hints.append(hint_result)
 
                 logger.debug(f"{plugin.name} & hint {hint_result.name} detected")
-            else:
+            elif not self._plugins.is_excluded(hint_name):
                 logger.error(f"{plugin.name} hints an invalid plugin: {hint_name}")
 
         return hints
@@ -155,114 +178,427 @@ class Detector:
             for hint in self.get_hints(plugin):
                 self._results.add_result(hint)
 
-    def _get_matchers_for_entry(self, plugin, entry):
-        grouped_matchers = plugin.get_grouped_matchers()
-
-        def remove_group(group):
-            if group in grouped_matchers:
-                del grouped_matchers[group]
+    def apply_plugin_matchers(
+        self, plugin, entry, url_matches=None, body_matchers=None
+    ):
+        """Return the most complete plugin match of ``plugin`` in ``entry``.
 
-        if self._get_entry_type(entry) == MAIN_ENTRY:
-            remove_group("body")
-            remove_group("url")
-        else:
-            remove_group("header")
-            remove_group("xpath")
+        ``url_matches`` are the results of the URL matcher engine for ``entry``,
+        they're used instead of applying ``plugin`` URL matchers.
 
-        remove_group("dom")
+        ``body_matchers`` are the body matchers that passed the prefilter
+        for ``entry``, only them are applied.
 
-        return grouped_matchers
+        """
+        steps = self._matcher_plans.get_steps(self._get_entry_type(entry), plugin)
+        return self._apply_steps(plugin, steps, entry, url_matches, body_matchers)
 
-    def apply_plugin_matchers(self, plugin, entry):
+    def _apply_steps(self, plugin, steps, entry, url_matches, body_matchers):
+        """ Return the most complete plugin match of ``plugin`` plan ``steps``. """
         data_list = []
-        grouped_matchers = self._get_matchers_for_entry(plugin, entry)
 
-        for matcher_type, matchers in grouped_matchers.items():
-            klass = MATCHERS[matcher_type]
-            plugin_match = klass.get_info(entry, *matchers)
-            if plugin_match.name or plugin_match.version or plugin_match.presence:
+        for matcher_type, matcher, matchers in steps:
+            if (
+                matcher_type == "url"
+                and url_matches is not None
+                and self._url_engine.handles(plugin)
+            ):
+                plugin_match = url_matches.get(plugin.name)
+                if plugin_match:
+                    data_list.append(plugin_match)
+
+                # Its time is recorded by the URL engine
+                if self._profiler:
+                    self._profiler.record(plugin.name, "url", 0, hit=bool(plugin_match))
+                continue
+
+            if (
+                matcher_type == "body"
+                and body_matchers is not None
+                and self._body_prefilter.handles(plugin)
+            ):
+                matchers = body_matchers.get(plugin.name)
+                if not matchers:
+                    continue
+
+            with self._measure(plugin.name, matcher_type, entry) as measure:
+                plugin_match = matcher.get_info(entry, *matchers)
+                measure["hit"] = bool(
+                    plugin_match.name or plugin_match.version or plugin_match.presence
+                )
+
+            if measure["hit"]:
                 data_list.append(plugin_match)
 
         return get_most_complete_pm(data_list)
 
-    def process_har(self):
-        """ Detect plugins present in the page. """
-        hints = []
+    def _get_url_matches(self, entry):
+        """ Return URL matches of every plugin in ``entry``. """
+        # URL matchers aren't applied on main entry
+        if self._get_entry_type(entry) == MAIN_ENTRY:
+            return {}
 
-        version_plugins = self._plugins.with_version_matchers()
-        generic_plugins = self._plugins.with_generic_matchers()
+        with self._measure(URL_ENGINE, "url", entry) as measure:
+            url_matches = self._url_engine.get_info(entry)
+            measure["hit"] = bool(url_matches)
 
-        for entry in self.har:
-            for plugin in version_plugins:
-                pm = self.apply_plugin_matchers(plugin, entry)
+        return url_matches
+
+    def _get_body_matchers(self, entry):
+        """ Return body matchers of every plugin that could match ``entry``. """
+        # Body matchers aren't applied on main entry
+        if self._get_entry_type(entry) == MAIN_ENTRY:
+            return {}
+
+        with self._measure(BODY_PREFILTER, "body", entry) as measure:
+            body = get_ascii_response_body(entry)
+            if body is None:
+                body = get_response_body(entry)
+
+            body_matchers = self._body_prefilter.get_matchers(body)
+            measure["hit"] = bool(body_matchers)
+
+        return body_matchers
+
+    def _get_routing_data(self, entry):
+        """Return URL matches, body matchers and routing features of ``entry``.
+
+        They're computed once and kept in the entry metadata,
+        then the deferred pass doesn't scan the entry again.
+
+        """
+        metadata = entry.setdefault("detectem", {})
+
+        try:
+            return metadata["routing"]
+        except KeyError:
+            url_matches = self._get_url_matches(entry)
+            body_matchers = self._get_body_matchers(entry)
+            features = self._router.get_features(entry, url_matches, body_matchers)
+
+            routing = metadata["routing"] = (url_matches, body_matchers, features)
+            return routing
+
+    def _get_cache_key(self, entry, scope=""):
+        """ Return the content address of ``entry`` match results in ``scope``. """
+        data = "\n".join(
+            [
+                self._plugins.version,
+                scope,
+                self._get_entry_type(entry),
+                entry["request"]["url"],
+                get_url(entry),
+                get_response_body_hash(entry),
+            ]
+        )
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def _get_results_from_file_hashes(self, entry, matched_plugins, dependent=False):
+        """Return results of version plugins identified only by ``entry`` body hash.
+
+        It detects files whose URL doesn't match any plugin matcher.
+        Plugins in ``matched_plugins`` are updated with the new matches.
+
+        Only plugins with prerequisites are considered if ``dependent=True``,
+        otherwise they're excluded (see :meth:`complete_entry`).
+
+        """
+        results = []
+
+        # Main entry is the page itself
+        if not self._file_hash_index or self._get_entry_type(entry) == MAIN_ENTRY:
+            return results
+
+        with self._measure(FILE_HASH_INDEX, "file-hash", entry) as measure:
+            versions = self._file_hash_index.get(get_response_body_hash(entry))
+            measure["hit"] = bool(versions)
+
+        for plugin_name, version in versions.items():
+            plugin = self._plugins.get(plugin_name)
+            if not plugin.is_version or plugin_name in matched_plugins:
+                continue
+
+            if (plugin_name in self._matcher_plans.prerequisites) != dependent:
+                continue
+
+            results.append(
+                Result(
+                    name=plugin.name,
+                    version=version,
+                    homepage=plugin.homepage,
+                    from_url=get_url(entry),
+                    plugin=plugin.name,
+                )
+            )
+            matched_plugins.append(plugin.name)
+
+        return results
+
+    def _get_plan(self, entry_type, features, generic=False, deferred_plugins=None):
+        """Return the plan of the plugins that could match an entry.
+
+        If ``deferred_plugins`` is provided, return the deferred plan
+        of these plugins.
+
+        """
+        deferred = deferred_plugins is not None
+        plan = self._router.route(entry_type, features, generic, deferred)
+        if deferred:
+            plan = tuple((p, steps) for p, steps in plan if p.name in deferred_plugins)
+
+        n_plugins = len(self._matcher_plans.get_plan(entry_type, generic, deferred))
+        self._n_evaluations += n_plugins
+        self._n_avoided_evaluations += n_plugins - len(plan)
+
+        return plan
+
+    def _get_result(self, plugin, pm, entry):
+        """ Return the result of ``plugin`` match ``pm`` in ``entry`` or ``None``. """
+        if plugin.is_generic:
+            plugin_data = plugin.get_information(entry)
+
+            # Only add to results if it's a valid result
+            if "name" not in plugin_data:
+                return None
+
+            return Result(
+                name=plugin_data["name"],
+                homepage=plugin_data["homepage"],
+                from_url=get_url(entry),
+                type=GENERIC_TYPE,
+                plugin=plugin.name,
+            )
+
+        # Set name if matchers could detect modular name
+        if pm.name:
+            name = "{}-{}".format(plugin.name, pm.name)
+        else:
+            name = plugin.name
+
+        version = pm.version
+        if not version and pm.presence:
+            # Try to get version through file hashes
+            with self._measure(plugin.name, "file-hash", entry) as measure:
+                version = self._file_hash_index.get_version(plugin.name, entry)
+                measure["hit"] = bool(version)
+
+        if version:
+            return Result(
+                name=name,
+                version=version,
+                homepage=plugin.homepage,
+                from_url=get_url(entry),
+                plugin=plugin.name,
+            )
+
+        if pm.presence:
+            return Result(
+                name=name,
+                homepage=plugin.homepage,
+                from_url=get_url(entry),
+                type=INDICATOR_TYPE,
+                plugin=plugin.name,
+            )
+
+        return None
+
+    def process_entry(self, entry):
+        """Return a tuple with the results found in ``entry``,
+        the plugins that matched it (to add their hints)
+        and the matches of plugins with prerequisites.
+
+        Matches of plugins with prerequisites are held to be merged with
+        their deferred matchers by :meth:`complete_entry`.
+
+        """
+        results = []
+        matched_plugins = []
+        held = {}
+
+        entry_type = self._get_entry_type(entry)
+        url_matches, body_matchers, features = self._get_routing_data(entry)
+
+        for generic in [False, True]:
+            for plugin, steps in self._get_plan(entry_type, features, generic):
+                pm = self._apply_steps(plugin, steps, entry, url_matches, body_matchers)
                 if not pm:
                     continue
 
-                # Set name if matchers could detect modular name
-                if pm.name:
-                    name = "{}-{}".format(plugin.name, pm.name)
-                else:
-                    name = plugin.name
-
-                if pm.version:
-                    self._results.add_result(
-                        Result(
-                            name=name,
-                            version=pm.version,
-                            homepage=plugin.homepage,
-                            from_url=get_url(entry),
-                            plugin=plugin.name,
-                        )
-                    )
-                elif pm.presence:
-                    # Try to get version through file hashes
-                    version = get_version_via_file_hashes(plugin, entry)
-                    if version:
-                        self._results.add_result(
-                            Result(
-                                name=name,
-                                version=version,
-                                homepage=plugin.homepage,
-                                from_url=get_url(entry),
-                                plugin=plugin.name,
-                            )
-                        )
-                    else:
-                        self._results.add_result(
-                            Result(
-                                name=name,
-                                homepage=plugin.homepage,
-                                from_url=get_url(entry),
-                                type=INDICATOR_TYPE,
-                                plugin=plugin.name,
-                            )
-                        )
-                hints += self.get_hints(plugin)
-
-            for plugin in generic_plugins:
-                pm = self.apply_plugin_matchers(plugin, entry)
-                if not pm:
+                matched_plugins.append(plugin.name)
+                if plugin.name in self._matcher_plans.prerequisites:
+                    held[plugin.name] = pm
                     continue
 
-                plugin_data = plugin.get_information(entry)
-
-                # Only add to results if it's a valid result
-                if "name" in plugin_data:
-                    self._results.add_result(
-                        Result(
-                            name=plugin_data["name"],
-                            homepage=plugin_data["homepage"],
-                            from_url=get_url(entry),
-                            type=GENERIC_TYPE,
-                            plugin=plugin.name,
-                        )
+                result = self._get_result(plugin, pm, entry)
+                if result:
+                    results.append(result)
+
+            if not generic:
+                results += self._get_results_from_file_hashes(entry, matched_plugins)
+
+        return results, matched_plugins, held
+
+    def complete_entry(self, entry, held, deferred_plugins):
+        """Return a tuple with the results of plugins with prerequisites
+        in ``entry`` and the plugins that matched it only now.
+
+        Deferred matchers of ``deferred_plugins`` are applied and merged
+        with the ``held`` matches of :meth:`process_entry`, as if every
+        matcher was applied at once.
+
+        """
+        pms = {name: [pm] for name, pm in held.items()}
+
+        if deferred_plugins:
+            entry_type = self._get_entry_type(entry)
+            url_matches, body_matchers, features = self._get_routing_data(entry)
+
+            for generic in [False, True]:
+                for plugin, steps in self._get_plan(
+                    entry_type, features, generic, deferred_plugins
+                ):
+                    pm = self._apply_steps(
+                        plugin, steps, entry, url_matches, body_matchers
                     )
+                    if pm:
+                        pms.setdefault(plugin.name, []).append(pm)
+
+        results = []
+        matched_plugins = list(held)
+
+        for plugin_name, plugin_pms in pms.items():
+            plugin = self._plugins.get(plugin_name)
+            result = self._get_result(plugin, get_most_complete_pm(plugin_pms), entry)
+            if result:
+                results.append(result)
+
+            if plugin_name not in matched_plugins:
+                matched_plugins.append(plugin_name)
+
+        results += self._get_results_from_file_hashes(
+            entry, matched_plugins, dependent=True
+        )
+
+        return results, [name for name in matched_plugins if name not in held]
+
+    def _has_deferred_plan(self, entry, deferred_plugins):
+        """ Return ``True`` if any of ``deferred_plugins`` has steps for ``entry``. """
+        entry_type = self._get_entry_type(entry)
+
+        return any(
+            plugin.name in deferred_plugins
+            for generic in [False, True]
+            for plugin, _ in self._matcher_plans.get_plan(entry_type, generic, True)
+        )
+
+    def _get_cached(self, entry, scope, process):
+        """Return ``process()`` output, a dictionary serializable to JSON,
+        from the match cache if ``entry`` was already processed in ``scope``.
+
+        Main entry isn't cached since header matchers are applied on it,
+        neither entries where body matchers exceeded their budgets.
+
+        """
+        if self._match_cache is None or self._get_entry_type(entry) == MAIN_ENTRY:
+            return process()
+
+        key = self._get_cache_key(entry, scope)
+        data = self._match_cache.get(key)
+        if data is None:
+            data = process()
+            if not is_over_budget(entry):
+                self._match_cache.set(key, data)
+
+        return data
+
+    def _process_entry_with_cache(self, entry):
+        """ Return :meth:`process_entry` output using the match cache. """
+
+        def process():
+            results, matched_plugins, held = self.process_entry(entry)
+            return {
+                "results": [vars(rt) for rt in results],
+                "plugins": matched_plugins,
+                "held": {name: list(pm) for name, pm in held.items()},
+            }
+
+        data = self._get_cached(entry, "", process)
+        held = {name: PluginMatch(*pm) for name, pm in data["held"].items()}
+
+        return [Result(**r) for r in data["results"]], data["plugins"], held
 
-                hints += self.get_hints(plugin)
+    def _complete_entry_with_cache(self, entry, held, deferred_plugins):
+        """ Return :meth:`complete_entry` output using the match cache. """
+
+        def process():
+            results, matched_plugins = self.complete_entry(
+                entry, held, deferred_plugins
+            )
+            return {"results": [vars(rt) for rt in results], "plugins": matched_plugins}
+
+        # Held matches depend on the entry only, they aren't part of the scope
+        scope = "deferred:" + ",".join(sorted(deferred_plugins))
+        data = self._get_cached(entry, scope, process)
+
+        return [Result(**r) for r in data["results"]], data["plugins"]
+
+    def _add_entry_results(self, results, matched_plugins, detected):
+        """Add ``results`` of an entry and return the hints of ``matched_plugins``.
+
+        Names of matched and hinted plugins are added to ``detected``.
+
+        """
+        hints = []
+
+        for rt in results:
+            self._results.add_result(rt)
+
+        for plugin_name in matched_plugins:
+            plugin_hints = self.get_hints(self._plugins.get(plugin_name))
+            hints += plugin_hints
+
+            detected.add(plugin_name)
+            detected.update(hint.name for hint in plugin_hints)
+
+        return hints
+
+    def process_har(self):
+        """Detect plugins present in the page.
+
+        Expensive matchers of plugins with prerequisites are applied
+        in a second pass, only if any of their prerequisites was detected
+        in the first pass or by Splash.
+
+        """
+        hints = []
+        detected = set()
+        held_matches = []
+
+        for entry in self.har:
+            results, matched_plugins, held = self._process_entry_with_cache(entry)
+            hints += self._add_entry_results(results, matched_plugins, detected)
+            held_matches.append(held)
+
+        detected.update(software["name"] for software in self._softwares_from_splash)
+        deferred_plugins = self._matcher_plans.get_deferred_plugins(detected)
+
+        for entry, held in zip(self.har, held_matches):
+            if not held and not self._has_deferred_plan(entry, deferred_plugins):
+                continue
+
+            results, matched_plugins = self._complete_entry_with_cache(
+                entry, held, deferred_plugins
+            )
+            hints += self._add_entry_results(results, matched_plugins, detected)
 
         for hint in hints:
             self._results.add_result(hint)
 
+        logger.debug(
+            f"[+] Plugin evaluations avoided by routing @ {self.requested_url}: "
+            f"{self._n_avoided_evaluations}/{self._n_evaluations}"
+        )
+
     def get_results(self, metadata=False):
         """ Return results of the analysis. """
         results_data = []
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import mmap
+import struct
+
+FORMAT_VERSION = 1
+DIGEST_SIZE = 32
+BLOOM_BITS_PER_DIGEST = 10
+BLOOM_HASHES = 7
+TRAILER = struct.Struct("<Q")
+
+
+def _get_bloom_positions(digest, n_bits):
+    """ Return bit positions of ``digest`` in a Bloom filter of ``n_bits``. """
+    # SHA-256 digests are uniform, then their slices are independent hashes
+    return [
+        int.from_bytes(digest[i * 4 : i * 4 + 4], "little") % n_bits
+        for i in range(BLOOM_HASHES)
+    ]
+
+
+def build_hash_database(records):
+    """Return the content of a hash database built from ``records``.
+
+    ``records`` is an iterable of dictionaries with ``plugin``, ``version``
+    and ``hash`` (SHA-256 hex digest) keys.
+
+    The database is composed of a Bloom filter of the digests, the sorted list
+    of unique 32-byte digests, a JSON metadata block with the
+    ``(plugin, version)`` pairs of every digest, and the metadata length
+    as a 64-bit unsigned integer.
+
+    """
+    values = {}
+    for record in records:
+        digest = bytes.fromhex(record["hash"])
+        pair = [record["plugin"], record["version"]]
+        if pair not in values.setdefault(digest, []):
+            values[digest].append(pair)
+
+    digests = sorted(values)
+
+    bloom_size = max(len(digests) * BLOOM_BITS_PER_DIGEST // 8, 64)
+    bloom = bytearray(bloom_size)
+    for digest in digests:
+        for pos in _get_bloom_positions(digest, bloom_size * 8):
+            bloom[pos >> 3] |= 1 << (pos & 7)
+
+    body = bytes(bloom) + b"".join(digests)
+    metadata = json.dumps(
+        {
+            "format": FORMAT_VERSION,
+            "count": len(digests),
+            "bloom_size": bloom_size,
+            "checksum": hashlib.sha256(body).hexdigest(),
+            "values": [values[digest] for digest in digests],
+        }
+    ).encode("utf-8")
+
+    return body + metadata + TRAILER.pack(len(metadata))
+
+
+class HashDatabase:
+    """Read-only database of file hashes stored in a package data file.
+
+    See :func:`build_hash_database` for the format. The file is memory mapped
+    on first use and most of the lookups of unknown digests only check
+    the Bloom filter.
+
+    """
+
+    def __init__(self, resource_name):
+        self.resource_name = resource_name
+        self._data = None
+        self._metadata = None
+
+    def _load(self):
+        import pkg_resources
+
+        filename = pkg_resources.resource_filename("detectem", self.resource_name)
+        with open(filename, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (metadata_size,) = TRAILER.unpack(data[-TRAILER.size :])
+        metadata_start = len(data) - TRAILER.size - metadata_size
+        metadata = json.loads(data[metadata_start : -TRAILER.size])
+
+        if metadata["format"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported hash database: {self.resource_name}")
+
+        self._data = data
+        self._metadata = metadata
+
+    @property
+    def metadata(self):
+        if self._metadata is None:
+            self._load()
+
+        return self._metadata
+
+    def __len__(self):
+        return self.metadata["count"]
+
+    @property
+    def checksum(self):
+        return self.metadata["checksum"]
+
+    def _might_contain(self, digest):
+        bloom_size = self._metadata["bloom_size"]
+        data = self._data
+
+        return all(
+            data[pos >> 3] & (1 << (pos & 7))
+            for pos in _get_bloom_positions(digest, bloom_size * 8)
+        )
+
+    def _find(self, digest):
+        """ Return index of ``digest`` in the sorted digests or ``None``. """
+        offset = self._metadata["bloom_size"]
+        data = self._data
+        lo, hi = 0, self._metadata["count"]
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = offset + mid * DIGEST_SIZE
+            current = data[start : start + DIGEST_SIZE]
+            if current < digest:
+                lo = mid + 1
+            elif current > digest:
+                hi = mid
+            else:
+                return mid
+
+        return None
+
+    def get(self, file_hash):
+        """ Return list of ``(plugin, version)`` having ``file_hash``. """
+        if self._metadata is None:
+            self._load()
+
+        digest = bytes.fromhex(file_hash)
+        if not self._might_contain(digest):
+            return []
+
+        index = self._find(digest)
+        if index is None:
+            return []
+
+        return [tuple(pair) for pair in self._metadata["values"][index]]
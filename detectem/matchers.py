@@ -1,11 +1,294 @@
+import functools
+import logging
 import re
 from collections import namedtuple
 
-from parsel import Selector
-
-from detectem.utils import get_response_body
+from lxml import etree
+
+from detectem.settings import (
+    INLINE_SCRIPT_ENTRY,
+    MAIN_ENTRY,
+    MATCHER_MAX_INPUT_SIZE,
+    RESOURCE_ENTRY,
+)
+from detectem.utils import (
+    get_ascii_response_body,
+    get_response_body,
+    get_response_body_bytes,
+    get_response_headers,
+    get_url,
+)
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    # Python < 3.11
+    import sre_parse
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+logger = logging.getLogger("detectem")
 
 PluginMatch = namedtuple("PluginMatch", "name,version,presence")
+PATTERN_TYPE = type(re.compile(""))
+
+# Shorter literals aren't selective enough to be used as prefilter
+MIN_LITERAL_LENGTH = 3
+
+# Character classes of ``\d``, ``\s`` and ``\w`` used by regex linting
+CATEGORY_REGEXES = {
+    getattr(sre_parse, f"CATEGORY_{name}"): re.compile(regex)
+    for name, regex in [
+        ("DIGIT", r"\d"),
+        ("NOT_DIGIT", r"\D"),
+        ("SPACE", r"\s"),
+        ("NOT_SPACE", r"\S"),
+        ("WORD", r"\w"),
+        ("NOT_WORD", r"\W"),
+    ]
+}
+
+# Same namespaces that parsel provides to XPath expressions
+XPATH_NAMESPACES = {"re": "http://exslt.org/regular-expressions"}
+
+
+def compile_regex(regex):
+    """Return ``regex`` compiled if it's a string, otherwise return it as is
+    (it could be a callable or ``None``).
+
+    """
+    if isinstance(regex, str):
+        return re.compile(regex, flags=re.DOTALL)
+
+    return regex
+
+
+@functools.lru_cache(maxsize=None)
+def get_bytes_regex(regex):
+    """Return ``regex`` compiled to match bytes if its pattern only contains
+    ASCII characters, otherwise return ``None``.
+
+    """
+    if not isinstance(regex, PATTERN_TYPE):
+        return None
+
+    try:
+        return re.compile(regex.pattern.encode("ascii"), regex.flags & ~re.UNICODE)
+    except (UnicodeEncodeError, re.error):
+        return None
+
+
+def compile_xpath(xpath):
+    """Return ``xpath`` expression compiled.
+
+    If it isn't valid, it's returned as is to fail when it's applied.
+
+    """
+    try:
+        return etree.XPath(xpath, namespaces=XPATH_NAMESPACES, smart_strings=False)
+    except etree.XPathError:
+        return xpath
+
+
+def compile_matcher(matcher_type, matcher):
+    """Return ``matcher`` of ``matcher_type`` with its regular expressions
+    and XPath expressions compiled.
+
+    Compiled patterns keep their named groups in ``groupindex``,
+    then extraction doesn't need to inspect every match.
+
+    """
+    if matcher_type in ["url", "body"]:
+        return compile_regex(matcher)
+    elif matcher_type == "header":
+        return tuple(compile_regex(v) if i else v for i, v in enumerate(matcher))
+    elif matcher_type == "xpath":
+        return tuple(
+            compile_regex(v) if i else compile_xpath(v) for i, v in enumerate(matcher)
+        )
+
+    return matcher
+
+
+def _get_literals(parsed):
+    """ Yield runs of consecutive literal characters required by ``parsed``. """
+    run = []
+
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+
+        yield "".join(run)
+        run = []
+
+        if op is sre_parse.SUBPATTERN:
+            add_flags, sub_pattern = av[1], av[-1]
+            if not add_flags & sre_parse.SRE_FLAG_IGNORECASE:
+                yield from _get_literals(sub_pattern)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            min_repeat, _, sub_pattern = av
+            # The repeated item must be present at least once
+            if min_repeat >= 1:
+                yield from _get_literals(sub_pattern)
+
+    yield "".join(run)
+
+
+def get_required_literal(matcher):
+    """Return the longest literal that every text matched by ``matcher`` contains.
+
+    Return ``None`` if ``matcher`` isn't a regex or there isn't any
+    literal long enough to be used to discard texts.
+
+    """
+    matcher = compile_regex(matcher)
+    if not isinstance(matcher, PATTERN_TYPE) or matcher.flags & re.IGNORECASE:
+        return None
+
+    try:
+        parsed = sre_parse.parse(matcher.pattern, matcher.flags)
+    except (re.error, ValueError):
+        return None
+
+    literal = max(_get_literals(parsed), key=len)
+    if len(literal) < MIN_LITERAL_LENGTH:
+        return None
+
+    return literal
+
+
+def _get_sub_patterns(op, av):
+    """ Return the patterns nested in the ``(op, av)`` item of a parsed regex. """
+    if op is sre_parse.SUBPATTERN:
+        return [av[-1]]
+    if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+        return [av[2]]
+    if op is sre_parse.BRANCH:
+        return av[1]
+    if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+        return [av[1]]
+    if op is getattr(sre_parse, "ATOMIC_GROUP", None):
+        return [av]
+
+    return []
+
+
+def _is_unbounded_repeat(op, av):
+    return (
+        op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+        and av[1] == sre_parse.MAXREPEAT
+    )
+
+
+def _matches_char(parsed, char):
+    """Return ``True`` if the single item of ``parsed`` could match ``char``
+    (a code point). Unknown items could match it.
+
+    """
+    if len(parsed) != 1:
+        return True
+
+    op, av = parsed[0]
+    if op is sre_parse.LITERAL:
+        return av == char
+    if op is sre_parse.NOT_LITERAL:
+        return av != char
+    if op is not sre_parse.IN:
+        return True
+
+    negate = found = False
+    for item_op, item_av in av:
+        if item_op is sre_parse.NEGATE:
+            negate = True
+        elif item_op is sre_parse.LITERAL:
+            found |= item_av == char
+        elif item_op is sre_parse.RANGE:
+            found |= item_av[0] <= char <= item_av[1]
+        elif item_op is sre_parse.CATEGORY and item_av in CATEGORY_REGEXES:
+            found |= bool(CATEGORY_REGEXES[item_av].match(chr(char)))
+        else:
+            return True
+
+    return found != negate
+
+
+def _is_delimited(parsed):
+    """Return ``True`` if ``parsed`` ends with a literal that its unbounded
+    repeats can't match, then repetitions of ``parsed`` can't overlap.
+
+    """
+    if not len(parsed) or parsed[-1][0] is not sre_parse.LITERAL:
+        return False
+
+    char = parsed[-1][1]
+    for op, av in parsed[:-1]:
+        if _is_unbounded_repeat(op, av):
+            if _matches_char(av[2], char):
+                return False
+        elif _get_sub_patterns(op, av):
+            return False
+
+    return True
+
+
+def _has_nested_repeat(parsed, in_repeat=False):
+    """ Return ``True`` if an unbounded repeat is nested in another one. """
+    for op, av in parsed:
+        is_unbounded = _is_unbounded_repeat(op, av)
+        if is_unbounded and in_repeat:
+            return True
+
+        for sub_pattern in _get_sub_patterns(op, av):
+            body = sub_pattern
+            if len(body) == 1 and body[0][0] is sre_parse.SUBPATTERN:
+                body = body[0][1][-1]
+
+            # Like ``([^/]+/)*``, repetitions are split by the final literal
+            nested = (in_repeat or is_unbounded) and not (
+                is_unbounded and _is_delimited(body)
+            )
+            if _has_nested_repeat(sub_pattern, nested):
+                return True
+
+    return False
+
+
+def _has_leading_wildcard(parsed):
+    """ Return ``True`` if ``parsed`` starts with an unbounded wildcard. """
+    if not len(parsed):
+        return False
+
+    op, av = parsed[0]
+    if op is sre_parse.SUBPATTERN:
+        return _has_leading_wildcard(av[-1])
+
+    return _is_unbounded_repeat(op, av) and [i[0] for i in av[2]] == [sre_parse.ANY]
+
+
+def get_regex_warnings(matcher):
+    """Return list of warnings about shapes of ``matcher`` prone to
+    catastrophic backtracking or quadratic searches.
+
+    """
+    if not isinstance(matcher, PATTERN_TYPE):
+        return []
+
+    try:
+        parsed = sre_parse.parse(matcher.pattern, matcher.flags)
+    except (re.error, ValueError):
+        return []
+
+    warnings = []
+    if _has_nested_repeat(parsed):
+        warnings.append("nested unbounded quantifiers")
+    if _has_leading_wildcard(parsed):
+        warnings.append("unanchored leading wildcard")
+
+    return warnings
 
 
 def extract_named_group(text, named_group, matchers, return_presence=False):
@@ -21,21 +304,21 @@ def extract_named_group(text, named_group, matchers, return_presence=False):
     presence = False
 
     for matcher in matchers:
-        if isinstance(matcher, str):
-            v = re.search(matcher, text, flags=re.DOTALL)
+        matcher = compile_regex(matcher)
+
+        if isinstance(matcher, PATTERN_TYPE):
+            v = matcher.search(text)
             if v:
-                dict_result = v.groupdict()
-                try:
-                    return dict_result[named_group]
-                except KeyError:
-                    if dict_result:
-                        # It's other named group matching, discard
-                        continue
-                    else:
-                        # It's a matcher without named_group
-                        # but we can't return it until every matcher pass
-                        # because a following matcher could have a named group
-                        presence = True
+                if named_group in matcher.groupindex:
+                    return v.group(named_group)
+                elif matcher.groupindex:
+                    # It's other named group matching, discard
+                    continue
+                else:
+                    # It's a matcher without named_group
+                    # but we can't return it until every matcher pass
+                    # because a following matcher could have a named group
+                    presence = True
         elif callable(matcher):
             v = matcher(text)
             if v:
@@ -55,49 +338,300 @@ def extract_name(text, *matchers):
     return extract_named_group(text, "name", matchers)
 
 
+def _to_str(value):
+    """ Return ``value`` decoded if it was matched by a bytes regex. """
+    if isinstance(value, bytes):
+        return value.decode("ascii")
+
+    return value
+
+
+def _iter_hits(text, matchers):
+    """Yield named groups of every matcher in ``matchers`` matching ``text``.
+
+    The value returned by a callable matcher is used as name and version.
+
+    """
+    for matcher in matchers:
+        matcher = compile_regex(matcher)
+
+        if isinstance(matcher, PATTERN_TYPE):
+            v = matcher.search(text)
+            if v:
+                yield {g: _to_str(v.group(g)) for g in matcher.groupindex}
+        elif callable(matcher):
+            v = matcher(text)
+            if v:
+                yield {"name": v, "version": v}
+
+
+def _get_info_from_hits(hits):
+    """Return :class:`PluginMatch` from ``hits``, the named groups
+    of the matchers that matched (in matcher order).
+
+    It follows :func:`extract_name` and :func:`extract_version` precedence:
+    the first hit providing a named group wins, hits with other named groups
+    are discarded and presence is only used if there's no version hit.
+
+    """
+    name = version = None
+    name_found = version_found = presence = False
+
+    for groups in hits:
+        if not groups:
+            presence = True
+            continue
+
+        if not name_found and "name" in groups:
+            name = groups["name"]
+            name_found = True
+
+        if not version_found and "version" in groups:
+            version = groups["version"]
+            version_found = True
+
+        if name_found and version_found:
+            break
+
+    return PluginMatch(
+        name=name, version=version, presence=presence and not version_found
+    )
+
+
+def extract_info(text, *matchers):
+    """Return :class:`PluginMatch` with name, version and presence
+    extracted from ``text`` in a single pass over ``matchers``.
+
+    """
+    return _get_info_from_hits(_iter_hits(text, matchers))
+
+
+def _merge_plugin_matches(pm, other):
+    """Return ``pm`` completed with ``other`` values without overriding them.
+
+    It's used when a matcher is applied to many strings of the same entry.
+
+    """
+    if pm.version:
+        return PluginMatch(
+            name=pm.name or other.name, version=pm.version, presence=pm.presence
+        )
+
+    return PluginMatch(
+        name=pm.name or other.name,
+        version=other.version,
+        presence=pm.presence or other.presence,
+    )
+
+
+def _get_urls(entry):
+    """ Return distinct request and response URLs of ``entry``. """
+    urls = []
+
+    for rtype in ["request", "response"]:
+        try:
+            url = entry[rtype]["url"]
+        except KeyError:
+            # It could not contain response
+            continue
+
+        # Same URL returns the same matches
+        if url not in urls:
+            urls.append(url)
+
+    return urls
+
+
 class UrlMatcher:
     @classmethod
     def get_info(cls, entry, *matchers):
-        name = None
-        version = None
-        presence = False
+        pm = PluginMatch(name=None, version=None, presence=False)
+
+        for url in _get_urls(entry):
+            pm = _merge_plugin_matches(pm, extract_info(url, *matchers))
+
+        return pm
+
 
-        for rtype in ["request", "response"]:
-            try:
-                url = entry[rtype]["url"]
-            except KeyError:
-                # It could not contain response
+class LiteralPrefilter:
+    """Discard ``matcher_type`` matchers that can't match a text.
+
+    Literals required by every regex are extracted when it's built
+    and a text is scanned once to find which of them are present.
+    It uses an Aho-Corasick automaton if ``pyahocorasick`` is installed,
+    otherwise a substring search per literal.
+
+    """
+
+    matcher_type = None
+
+    def __init__(self, plugins):
+        self._matchers = {}
+        literals = set()
+
+        for plugin in plugins:
+            matchers = plugin.get_matchers(self.matcher_type)
+            if not matchers:
                 continue
 
-            if not name:
-                name = extract_name(url, *matchers)
+            plugin_matchers = []
+            for matcher in matchers:
+                literal = get_required_literal(matcher)
+                plugin_matchers.append((matcher, literal))
+                if literal:
+                    literals.add(literal)
 
-            if not version:
-                version = extract_version(url, *matchers)
-                if version:
-                    if version == "presence":
-                        presence = True
-                        version = None
+            self._matchers[plugin.name] = plugin_matchers
 
-        return PluginMatch(name=name, version=version, presence=presence)
+        self._literals = sorted(literals)
+        self._bytes_literals = [(lit, lit.encode("utf-8")) for lit in self._literals]
+        self._automaton = None
+
+        if ahocorasick and self._literals:
+            self._automaton = ahocorasick.Automaton()
+            for literal in self._literals:
+                self._automaton.add_word(literal, literal)
+            self._automaton.make_automaton()
+
+    def handles(self, plugin):
+        """ Return ``True`` if matchers of ``plugin`` are filtered. """
+        return plugin.name in self._matchers
+
+    def _get_present_literals(self, text):
+        if self._automaton:
+            if isinstance(text, bytes):
+                text = text.decode("ascii")
+
+            return {literal for _, literal in self._automaton.iter(text)}
+
+        if isinstance(text, bytes):
+            return {
+                literal
+                for literal, bliteral in self._bytes_literals
+                if bliteral in text
+            }
+
+        return {literal for literal in self._literals if literal in text}
+
+    def get_matchers(self, text):
+        """Return a dictionary of plugin name and its matchers
+        that could match ``text``, it could also be ASCII bytes.
+
+        Plugins without any candidate matcher aren't included.
+
+        """
+        present = self._get_present_literals(text)
+        candidates = {}
+
+        for plugin_name, plugin_matchers in self._matchers.items():
+            matchers = [
+                matcher
+                for matcher, literal in plugin_matchers
+                if not literal or literal in present
+            ]
+            if matchers:
+                candidates[plugin_name] = matchers
+
+        return candidates
+
+
+class BodyPrefilter(LiteralPrefilter):
+    """ Discard body matchers that can't match a body. """
+
+    matcher_type = "body"
+
+
+class UrlMatcherEngine:
+    """Apply the URL matchers of many plugins to the URLs of an entry.
+
+    Every URL is scanned once for the literals required by URL regexes
+    (see :class:`LiteralPrefilter`) and only the matchers of the plugins
+    that could match it are applied.
+
+    """
+
+    class UrlPrefilter(LiteralPrefilter):
+        matcher_type = "url"
+
+    def __init__(self, plugins):
+        self._prefilter = self.UrlPrefilter(plugins)
+
+    def handles(self, plugin):
+        """ Return ``True`` if URL matchers of ``plugin`` are applied by the engine. """
+        return self._prefilter.handles(plugin)
+
+    def get_info(self, entry):
+        """Return a dictionary of plugin name and :class:`PluginMatch`
+        for every plugin matching ``entry`` URLs.
+
+        It follows :meth:`UrlMatcher.get_info` semantics.
+
+        """
+        results = {}
+
+        for url in _get_urls(entry):
+            for plugin_name, matchers in self._prefilter.get_matchers(url).items():
+                hits = list(_iter_hits(url, matchers))
+                if not hits:
+                    continue
+
+                pm = results.get(plugin_name, PluginMatch(None, None, False))
+                results[plugin_name] = _merge_plugin_matches(
+                    pm, _get_info_from_hits(hits)
+                )
+
+        return results
+
+
+def is_oversized(entry):
+    """Return ``True`` if ``entry`` body exceeds ``MATCHER_MAX_INPUT_SIZE``.
+
+    Body and XPath matchers aren't applied on oversized bodies.
+
+    """
+    if not MATCHER_MAX_INPUT_SIZE:
+        return False
+
+    metadata = entry.setdefault("detectem", {})
+
+    try:
+        return metadata["oversized"]
+    except KeyError:
+        size = len(get_response_body_bytes(entry))
+        oversized = metadata["oversized"] = size > MATCHER_MAX_INPUT_SIZE
+        if oversized:
+            logger.warning(
+                f"[-] Body of {get_url(entry)} has {size} bytes, "
+                "skipping body matchers"
+            )
+
+        return oversized
+
+
+def is_over_budget(entry):
+    """Return ``True`` if body matchers were skipped on ``entry``.
+
+    Matches of these entries aren't cached, since they depend
+    on ``MATCHER_MAX_INPUT_SIZE``.
+
+    """
+    return entry.get("detectem", {}).get("oversized", False)
 
 
 class BodyMatcher:
     @classmethod
     def get_info(cls, entry, *matchers):
-        name = None
-        version = None
-        presence = False
-        body = get_response_body(entry)
+        if is_oversized(entry):
+            return PluginMatch(name=None, version=None, presence=False)
 
-        name = extract_name(body, *matchers)
-        version = extract_version(body, *matchers)
-        if version:
-            if version == "presence":
-                presence = True
-                version = None
+        # Avoid decoded text if every matcher can be applied on body bytes
+        body = get_ascii_response_body(entry)
+        if body is not None:
+            bytes_matchers = [get_bytes_regex(compile_regex(m)) for m in matchers]
+            if all(bytes_matchers):
+                return extract_info(body, *bytes_matchers)
 
-        return PluginMatch(name=name, version=version, presence=presence)
+        return extract_info(get_response_body(entry), *matchers)
 
 
 class HeaderMatcher:
@@ -105,42 +639,69 @@ class HeaderMatcher:
     def _get_matches(cls, headers, *matchers):
         try:
             for matcher_name, matcher_value in matchers:
-                for header in headers:
-                    if header["name"] == matcher_name:
-                        yield header["value"], matcher_value
+                for value in headers.get(matcher_name.lower(), []):
+                    yield value, matcher_value
         except ValueError:
             raise ValueError("Header matcher value must be a tuple")
 
     @classmethod
     def get_info(cls, entry, *matchers):
-        name = None
-        version = None
-        presence = False
-        headers = entry["response"]["headers"]
+        pm = PluginMatch(name=None, version=None, presence=False)
+        headers = get_response_headers(entry)
 
         for hstring, hmatcher in cls._get_matches(headers, *matchers):
             # Avoid overriding
-            if not name:
-                name = extract_name(hstring, hmatcher)
+            pm = _merge_plugin_matches(pm, extract_info(hstring, hmatcher))
 
-            if not version:
-                version = extract_version(hstring, hmatcher)
-                if version:
-                    if version == "presence":
-                        presence = True
-                        version = None
+        return pm
 
-        return PluginMatch(name=name, version=version, presence=presence)
+
+def get_selector(entry):
+    """Return the selector of ``entry`` body.
+
+    The body is parsed once and the selector is kept
+    in the entry metadata to be shared by every plugin.
+
+    """
+    from parsel import Selector
+
+    metadata = entry.setdefault("detectem", {})
+
+    try:
+        return metadata["selector"]
+    except KeyError:
+        selector = metadata["selector"] = Selector(text=get_response_body(entry))
+        return selector
 
 
 class XPathMatcher:
+    @classmethod
+    def _get_first_value(cls, selector, xpath):
+        """ Return the first result of ``xpath`` like parsel's ``extract_first``. """
+        if isinstance(xpath, str):
+            return selector.xpath(xpath).extract_first()
+
+        result = xpath(selector.root)
+        if type(result) is not list:
+            result = [result]
+
+        if not result:
+            return None
+
+        from parsel import Selector
+
+        return Selector(root=result[0], type=selector.type).get()
+
     @classmethod
     def get_info(cls, entry, *matchers):
         name = None
         version = None
         presence = False
-        body = get_response_body(entry)
-        selector = Selector(text=body)
+
+        if is_oversized(entry):
+            return PluginMatch(name=name, version=version, presence=presence)
+
+        selector = get_selector(entry)
 
         for matcher in matchers:
             if len(matcher) == 2:
@@ -149,21 +710,199 @@ class XPathMatcher:
                 xpath = matcher[0]
                 regexp = None
 
-            value = selector.xpath(xpath).extract_first()
+            value = cls._get_first_value(selector, xpath)
             if not value:
                 continue
 
             if regexp:
+                pm = extract_info(value, regexp)
+
                 # Avoid overriding
                 if not name:
-                    name = extract_name(value, regexp)
+                    name = pm.name
 
-                version = extract_version(value, regexp)
-                if version == "presence":
+                version = pm.version
+                if pm.presence:
                     presence = True
-                    version = None
                     break
             else:
                 presence = True
 
         return PluginMatch(name=name, version=version, presence=presence)
+
+
+MATCHERS = {
+    "url": UrlMatcher(),
+    "body": BodyMatcher(),
+    "header": HeaderMatcher(),
+    "xpath": XPathMatcher(),
+}
+
+# Matcher types applied on every entry type
+ENTRY_MATCHER_TYPES = {
+    MAIN_ENTRY: ["header", "xpath"],
+    RESOURCE_ENTRY: ["url", "body"],
+    INLINE_SCRIPT_ENTRY: ["url", "body"],
+}
+
+
+# Matcher types applied before prerequisites of a plugin are detected
+CHEAP_MATCHER_TYPES = ["url", "header"]
+
+
+class MatcherPlans:
+    """Matchers of every plugin to apply on each entry type.
+
+    The plan of an entry type is a tuple of ``(plugin, steps)`` and every step
+    is a ``(matcher type, matcher, matchers)`` tuple, following the order of
+    :meth:`Plugin.get_grouped_matchers`. Plugins without matchers
+    for an entry type aren't included in its plan.
+
+    Expensive steps of plugins with ``prerequisites`` are kept in
+    a ``deferred`` plan, to be applied only once a prerequisite is detected.
+    Prerequisites that aren't in ``plugins`` are ignored.
+
+    """
+
+    def __init__(self, plugins):
+        self._steps = {}
+        self._plans = {}
+
+        plugin_names = {plugin.name for plugin in plugins}
+        self.prerequisites = {}
+        for plugin in plugins:
+            prerequisites = set(getattr(plugin, "prerequisites", [])) & plugin_names
+            if prerequisites:
+                self.prerequisites[plugin.name] = prerequisites
+
+        for entry_type, matcher_types in ENTRY_MATCHER_TYPES.items():
+            self._steps[entry_type] = {}
+
+            for plugin in plugins:
+                steps = tuple(
+                    (matcher_type, MATCHERS[matcher_type], tuple(matchers))
+                    for matcher_type, matchers in plugin.get_grouped_matchers().items()
+                    if matcher_type in matcher_types
+                )
+                if steps:
+                    self._steps[entry_type][plugin.name] = (plugin, steps)
+
+            for generic in [False, True]:
+                plan = []
+                deferred_plan = []
+
+                for plugin, steps in self._steps[entry_type].values():
+                    if plugin.is_generic != generic:
+                        continue
+
+                    if plugin.name not in self.prerequisites:
+                        plan.append((plugin, steps))
+                        continue
+
+                    cheap_steps = tuple(s for s in steps if s[0] in CHEAP_MATCHER_TYPES)
+                    if cheap_steps:
+                        plan.append((plugin, cheap_steps))
+
+                    deferred_steps = tuple(s for s in steps if s not in cheap_steps)
+                    if deferred_steps:
+                        deferred_plan.append((plugin, deferred_steps))
+
+                self._plans[(entry_type, generic, False)] = tuple(plan)
+                self._plans[(entry_type, generic, True)] = tuple(deferred_plan)
+
+    def get_plan(self, entry_type, generic=False, deferred=False):
+        """Return the plan of version (or ``generic``) plugins for ``entry_type``,
+        or their ``deferred`` plan.
+
+        """
+        return self._plans[(entry_type, generic, deferred)]
+
+    def get_plans(self):
+        """ Return ``((entry type, generic, deferred), plan)`` tuples of every plan. """
+        return self._plans.items()
+
+    def get_steps(self, entry_type, plugin):
+        """ Return the steps of ``plugin`` for ``entry_type``. """
+        try:
+            return self._steps[entry_type][plugin.name][1]
+        except KeyError:
+            return ()
+
+    def get_deferred_plugins(self, detected):
+        """ Return names of plugins with a prerequisite in ``detected``. """
+        return {
+            name
+            for name, prerequisites in self.prerequisites.items()
+            if prerequisites & detected
+        }
+
+
+class EntryRouter:
+    """Dispatch entries only to the plugins of a plan that could match them.
+
+    Every step of a plan is indexed by the entry feature it requires:
+    a URL engine match, a body prefilter candidate or a header name.
+    Steps that can't be decided with these features are always applied.
+
+    """
+
+    def __init__(self, matcher_plans, url_engine, body_prefilter):
+        self._url_engine = url_engine
+        self._body_prefilter = body_prefilter
+        self._routes = {}
+
+        for key, plan in matcher_plans.get_plans():
+            always = []
+            index = {}
+
+            for position, (plugin, steps) in enumerate(plan):
+                features = self._get_required_features(plugin, steps)
+                if features is None:
+                    always.append(position)
+                    continue
+
+                for feature in features:
+                    index.setdefault(feature, []).append(position)
+
+            self._routes[key] = (plan, always, index)
+
+    def _get_required_features(self, plugin, steps):
+        """Return the features that ``plugin`` steps need to match,
+        ``None`` if any step could match without them.
+
+        """
+        features = set()
+
+        for matcher_type, _, matchers in steps:
+            if matcher_type == "url" and self._url_engine.handles(plugin):
+                features.add(("url", plugin.name))
+            elif matcher_type == "body" and self._body_prefilter.handles(plugin):
+                features.add(("body", plugin.name))
+            elif matcher_type == "header":
+                features.update(("header", name.lower()) for name, _ in matchers)
+            else:
+                return None
+
+        return features
+
+    @staticmethod
+    def get_features(entry, url_matches, body_matchers):
+        """ Return the features of ``entry`` used to route it. """
+        features = {("header", name) for name in get_response_headers(entry)}
+        features.update(("url", name) for name in url_matches)
+        features.update(("body", name) for name in body_matchers)
+
+        return features
+
+    def route(self, entry_type, features, generic=False, deferred=False):
+        """Return the plan for ``entry_type`` with only the plugins
+        that could match an entry with ``features``.
+
+        """
+        plan, always, index = self._routes[(entry_type, generic, deferred)]
+
+        positions = set(always)
+        for feature in features:
+            positions.update(index.get(feature, []))
+
+        return tuple(plan[i] for i in sorted(positions))
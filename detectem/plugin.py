@@ -1,14 +1,30 @@
+import functools
 import glob
+import hashlib
 import inspect
+import json
 import logging
 import re
+import time
+from collections import OrderedDict
 from importlib.util import find_spec, module_from_spec
 
 from zope.interface import Attribute, Interface, implementer
 from zope.interface.exceptions import BrokenImplementation
 from zope.interface.verify import verifyObject
 
+from detectem import __version__
+from detectem.matchers import (
+    BodyPrefilter,
+    EntryRouter,
+    MatcherPlans,
+    UrlMatcherEngine,
+    compile_matcher,
+    get_regex_warnings,
+)
+from detectem.response import create_lua_script
 from detectem.settings import PLUGIN_PACKAGES
+from detectem.utils import FileHashIndex
 
 logger = logging.getLogger("detectem")
 
@@ -118,14 +134,41 @@ PLUGIN_TAGS = (
 
 
 class PluginCollection(object):
+    # Filtered collections kept by :meth:`filter`
+    MAX_FILTERED_COLLECTIONS = 32
+
     def __init__(self):
         self._plugins = {}
+        self._frozen = False
+        self._cache = {}
+        self._filtered = OrderedDict()
+
+        # Names of plugins removed by :meth:`filter`
+        self._excluded = set()
 
     def __len__(self):
         return len(self._plugins)
 
+    @property
+    def frozen(self):
+        return self._frozen
+
+    def freeze(self):
+        """Make the collection read-only.
+
+        It's used by the process-wide registry to avoid
+        modifications once it's shared between callers.
+
+        """
+        self._frozen = True
+
     def add(self, ins):
+        if self._frozen:
+            raise RuntimeError("Plugin collection is frozen")
+
         self._plugins[ins.name] = ins
+        self._cache = {}
+        self._filtered = OrderedDict()
 
     def get(self, name):
         return self._plugins.get(name)
@@ -133,6 +176,43 @@ class PluginCollection(object):
     def get_all(self):
         return self._plugins.values()
 
+    def is_excluded(self, name):
+        """ Return ``True`` if plugin ``name`` was removed by :meth:`filter`. """
+        return name in self._excluded
+
+    def filter(self, names=None, tags=None):
+        """Return a frozen collection with the plugins in ``names``
+        and the plugins with any of ``tags``.
+
+        The last ``MAX_FILTERED_COLLECTIONS`` filtered collections
+        are cached, then every caller gets the same instance
+        (and its engines) for the same arguments.
+
+        """
+        key = (frozenset(names or []), frozenset(tags or []))
+
+        try:
+            self._filtered.move_to_end(key)
+            return self._filtered[key]
+        except KeyError:
+            pass
+
+        plugins = PluginCollection()
+        for plugin in self._plugins.values():
+            if plugin.name in key[0] or set(plugin.tags) & key[1]:
+                plugins.add(plugin)
+            else:
+                plugins._excluded.add(plugin.name)
+
+        plugins._excluded |= self._excluded
+        plugins.freeze()
+
+        self._filtered[key] = plugins
+        while len(self._filtered) > self.MAX_FILTERED_COLLECTIONS:
+            self._filtered.popitem(last=False)
+
+        return plugins
+
     def with_version_matchers(self):
         return [p for p in self._plugins.values() if p.is_version]
 
@@ -142,6 +222,83 @@ class PluginCollection(object):
     def with_generic_matchers(self):
         return [p for p in self._plugins.values() if p.is_generic]
 
+    @property
+    def version(self):
+        """Fingerprint of the plugins and their matchers.
+
+        It changes if any plugin is added or modified,
+        then it's used to key cached match results.
+
+        """
+        if "version" not in self._cache:
+            file_hash_index = self.get_file_hash_index()
+            data = [__version__, file_hash_index.checksum] + [
+                [
+                    p.name,
+                    p.__class__.__module__,
+                    repr(p.matchers),
+                    repr(getattr(p, "file_hashes", {})),
+                    repr(getattr(p, "prerequisites", [])),
+                ]
+                for p in sorted(self._plugins.values(), key=lambda p: p.name)
+            ]
+            self._cache["version"] = hashlib.sha256(
+                json.dumps(data).encode("utf-8")
+            ).hexdigest()
+
+        return self._cache["version"]
+
+    def _get_engine(self, engine_class):
+        """Return ``engine_class`` instance built from the plugins.
+
+        It's built once and discarded when a plugin is added.
+
+        """
+        if engine_class not in self._cache:
+            self._cache[engine_class] = engine_class(self._plugins.values())
+
+        return self._cache[engine_class]
+
+    def get_url_engine(self):
+        """ Return the engine applying URL matchers of every plugin at once. """
+        return self._get_engine(UrlMatcherEngine)
+
+    def get_body_prefilter(self):
+        """ Return the prefilter of body matchers of every plugin. """
+        return self._get_engine(BodyPrefilter)
+
+    def get_matcher_plans(self):
+        """ Return the matchers of every plugin to apply on each entry type. """
+        return self._get_engine(MatcherPlans)
+
+    def get_entry_router(self):
+        """ Return the router of entries to the plugins that could match them. """
+        if EntryRouter not in self._cache:
+            self._cache[EntryRouter] = EntryRouter(
+                self.get_matcher_plans(),
+                self.get_url_engine(),
+                self.get_body_prefilter(),
+            )
+
+        return self._cache[EntryRouter]
+
+    def get_file_hash_index(self):
+        """ Return the index of the file hashes of every plugin. """
+        return self._get_engine(FileHashIndex)
+
+    def get_lua_script(self):
+        """ Return the Splash script with the DOM matchers of every plugin. """
+        if "lua_script" not in self._cache:
+            start = time.perf_counter()
+            lua_script = self._cache["lua_script"] = create_lua_script(self)
+
+            logger.debug(
+                "[+] Built Lua script of %(n)d bytes in %(time).4fs",
+                {"n": len(lua_script), "time": time.perf_counter() - start},
+            )
+
+        return self._cache["lua_script"]
+
 
 class _PluginLoader:
     def __init__(self):
@@ -203,6 +360,23 @@ class _PluginLoader:
 
         return True
 
+    def _lint_matchers(self, instance):
+        """ Log warnings about regular expressions prone to be slow. """
+        regexes = instance.get_matchers("url") + instance.get_matchers("body")
+        regexes += [m[1] for m in instance.get_matchers("header")]
+        regexes += [m[1] for m in instance.get_matchers("xpath") if len(m) == 2]
+
+        for regex in regexes:
+            for warning in get_regex_warnings(regex):
+                logger.warning(
+                    "Plugin '%(name)s' matcher %(pattern)r has %(warning)s",
+                    {
+                        "name": instance.name,
+                        "pattern": regex.pattern,
+                        "warning": warning,
+                    },
+                )
+
     def load_plugins(self, plugins_package):
         """ Load plugins from `plugins_package` module. """
         try:
@@ -233,19 +407,35 @@ class _PluginLoader:
 
                 instance = klass()
                 if self._is_plugin_ok(instance):
+                    instance.compile_matchers()
+                    self._lint_matchers(instance)
                     self.plugins.add(instance)
 
 
+@functools.lru_cache(maxsize=None)
 def load_plugins():
-    """ Return the list of plugin instances. """
+    """Return the process-wide registry of plugin instances.
+
+    The registry is built once per process and frozen, then it's shared
+    by every caller (and by forked workers if it's loaded before forking).
+    Use :func:`reset_plugins` to force a rebuild.
+
+    """
     loader = _PluginLoader()
 
     for pkg in PLUGIN_PACKAGES:
         loader.load_plugins(pkg)
 
+    loader.plugins.freeze()
+
     return loader.plugins
 
 
+def reset_plugins():
+    """ Invalidate the plugin registry built by :func:`load_plugins`. """
+    load_plugins.cache_clear()
+
+
 class IPlugin(Interface):
     name = Attribute(""" Name to identify the plugin. """)
     homepage = Attribute(""" Plugin homepage. """)
@@ -262,8 +452,20 @@ class Plugin:
 
     ptype = "normal"
 
+    def compile_matchers(self):
+        """Compile regular expressions of ``matchers``.
+
+        It's done once by the plugin loader, then :meth:`get_matchers`
+        returns the compiled matchers.
+
+        """
+        self._compiled_matchers = [
+            {k: compile_matcher(k, v) for k, v in m.items()} for m in self.matchers
+        ]
+
     def get_matchers(self, matcher_type):
-        return [m[matcher_type] for m in self.matchers if matcher_type in m]
+        matchers = getattr(self, "_compiled_matchers", self.matchers)
+        return [m[matcher_type] for m in matchers if matcher_type in m]
 
     def get_grouped_matchers(self):
         """Return dictionary of matchers (not empty ones)
@@ -5,6 +5,7 @@ class CrayonSyntaxHighlighterPlugin(Plugin):
     name = "crayon-syntax-highlighter"
     homepage = "https://wordpress.org/plugins-wp/crayon-syntax-highlighter/"
     tags = ["wordpress"]
+    prerequisites = ["wordpress"]
 
     matchers = [
         {"dom": ("window.CrayonSyntaxSettings", "window.CrayonSyntaxSettings.version")}
@@ -1,24 +1,16 @@
-import json
-import pkgutil
 import re
 
 from detectem.plugin import GenericPlugin
-from detectem.utils import get_url
+from detectem.utils import SortedIndex, get_url
 
 
 class WordpressGenericPlugin(GenericPlugin):
     name = "wordpress_generic"
     homepage = "https://wordpress.org/plugins/%s/"
     tags = ["wordpress"]
-    plugins = {}
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-        wordpress_data = pkgutil.get_data("detectem", "data/wordpress.jl")
-        for line in wordpress_data.splitlines():
-            data = json.loads(line)
-            self.plugins[data["name"]] = data["vendor"]
+    # Built from `data/wordpress.jl` by `scripts/build_wordpress_index.py`
+    plugins = SortedIndex("data/wordpress.idx")
 
     matchers = [{"url": "/wp-content/plugins/"}]
 
@@ -30,10 +22,6 @@ class WordpressGenericPlugin(GenericPlugin):
 
         name = name_match[0].lower()
         homepage = self.homepage % name
-
-        try:
-            vendor = self.plugins[name]
-        except KeyError:
-            vendor = None
+        vendor = self.plugins.get(name)
 
         return {"name": name, "homepage": homepage, "vendor": vendor}
@@ -23,6 +23,7 @@ class ColorBoxPlugin(Plugin):
     name = "jquery-colorbox"
     homepage = "http://www.jacklmoore.com/colorbox/"
     tags = ["javascript", "jquery"]
+    prerequisites = ["jquery"]
 
     matchers = [{"body": r"// ColorBox v(?P<version>[0-9\.]+) - a full featured"}]
 
@@ -31,5 +32,6 @@ class JqueryMigratePlugin(Plugin):
     name = "jquery-migrate"
     homepage = "https://github.com/jquery/jquery-migrate"
     tags = ["javascript", "jquery"]
+    prerequisites = ["jquery"]
 
     matchers = [{"body": r"/*! jQuery Migrate v(?P<version>[0-9\.]+) \| \(c\) jQuery"}]
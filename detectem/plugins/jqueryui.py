@@ -5,6 +5,7 @@ class JqueryUiPlugin(Plugin):
     name = "jqueryui"
     homepage = "http://jqueryui.com"
     tags = ["javascript", "jquery"]
+    prerequisites = ["jquery"]
 
     matchers = [
         {"body": r"jQuery UI (\w+ )+(?P<version>[0-9\.]+)"},
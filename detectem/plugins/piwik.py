@@ -8,60 +8,3 @@ class PiwikPlugin(Plugin):
     tags = ["analytics"]
 
     matchers = [{"body": r"/\*!!\s+ \* Piwik - free/libre analytics platform"}]
-    file_hashes = {
-        "/piwik.js": {
-            "2.0.2": "a3dc8ef0fea499626ae53bc8e1a1d5def45bf3c3ea4c90aae38325bcd40a4198",
-            "2.0.3": "a3dc8ef0fea499626ae53bc8e1a1d5def45bf3c3ea4c90aae38325bcd40a4198",
-            "2.1.0": "36e634c0b665c18a45fb01afc067d8da014295c25fe62445f9ee46a7936a7551",
-            "2.10.0": "14a4d7d5ec8a8ed2bcf6861bd418ad5c015cbd38a33d4e777a4e82b15aaba416",
-            "2.11.0": "c507d83a495dabd4562d9e8d7a89295a0c817bdfe3f355e5409d52a4387591e9",
-            "2.11.1": "c507d83a495dabd4562d9e8d7a89295a0c817bdfe3f355e5409d52a4387591e9",
-            "2.11.2": "03a9ee60740e86308067e0dcda878a1e9087e437c926bcd114fee1fc66352223",
-            "2.12.0": "5133454dc113dd1149879a08349aac88aaff835a963faf945f848dfd66e64530",
-            "2.12.1": "5133454dc113dd1149879a08349aac88aaff835a963faf945f848dfd66e64530",
-            "2.13.0": "c9bef9c3b566f387eaff6d62107de48a951515c4549b27dafe70f21ad8c62b25",
-            "2.13.1": "c9bef9c3b566f387eaff6d62107de48a951515c4549b27dafe70f21ad8c62b25",
-            "2.14.0": "6dae32a01833cd0ce2f55c5bd910ffa21a032b6227eb42701386ae8181a06f54",
-            "2.14.1": "6dae32a01833cd0ce2f55c5bd910ffa21a032b6227eb42701386ae8181a06f54",
-            "2.14.2": "9fbda8a59fbfc183b5ef3f5190d543574bc6dd1468f80a81fce74e5c212171f2",
-            "2.14.3": "9fbda8a59fbfc183b5ef3f5190d543574bc6dd1468f80a81fce74e5c212171f2",
-            "2.15.0": "02e66e19e5d2b0957f948fba33c867652f7607a1c27676745b48263f40d03e3e",
-            "2.16.0": "5af2a36db66a4d78269adf19d3e1485f71ed9b45220026bab21d3595b5ab3d97",
-            "2.16.1": "4ca8f7722320d5e59ac553dc60baf881d5fddc53eef14a442c8f69bc2b481a4a",
-            "2.16.2": "d3049c2dd205f92b69e0938521ab7e2a2258276e693afc965095d84f70d8b336",
-            "2.16.3": "a569ed96e0068f4a12783f58bad7ba46644fb5cf571fed1634956a5ab4ce6792",
-            "2.16.4": "a569ed96e0068f4a12783f58bad7ba46644fb5cf571fed1634956a5ab4ce6792",
-            "2.16.5": "a569ed96e0068f4a12783f58bad7ba46644fb5cf571fed1634956a5ab4ce6792",
-            "2.17.0": "a569ed96e0068f4a12783f58bad7ba46644fb5cf571fed1634956a5ab4ce6792",
-            "2.17.1": "714576ef1d7b58980b7658ae9b8b4d74a223fba87934dc442db4098873e179a3",
-            "2.2.0": "4baa6799598d2bbcb9e01626d2dcc11d46e2d1045f05fb49f557a0ff82b96c2a",
-            "2.2.1": "4baa6799598d2bbcb9e01626d2dcc11d46e2d1045f05fb49f557a0ff82b96c2a",
-            "2.2.2": "4baa6799598d2bbcb9e01626d2dcc11d46e2d1045f05fb49f557a0ff82b96c2a",
-            "2.3.0": "90df3ecfd311b43c73ddcf659091b1339df53b13af62f03b9e12286856cd2d46",
-            "2.4.0": "396765e89a8163ef75e94fa0e11ae32233c19ef0e08a70b2d7780ca9802c3dd0",
-            "2.4.1": "396765e89a8163ef75e94fa0e11ae32233c19ef0e08a70b2d7780ca9802c3dd0",
-            "2.5.0": "664e1545be52000a249d20d0e1e98c93d819b862760ee6200d09950c85d521ec",
-            "2.6.0": "664e1545be52000a249d20d0e1e98c93d819b862760ee6200d09950c85d521ec",
-            "2.6.1": "664e1545be52000a249d20d0e1e98c93d819b862760ee6200d09950c85d521ec",
-            "2.7.0": "136efb353a418331df2b85ca05e9afbbca5a33db2225d2215d7bca983264c61d",
-            "2.8.0": "bfc3d18460a6b969f473d9f5067457c13de349943352dee71e14615e4f3b5fab",
-            "2.8.1": "bfc3d18460a6b969f473d9f5067457c13de349943352dee71e14615e4f3b5fab",
-            "2.8.2": "bfc3d18460a6b969f473d9f5067457c13de349943352dee71e14615e4f3b5fab",
-            "2.8.3": "bfc3d18460a6b969f473d9f5067457c13de349943352dee71e14615e4f3b5fab",
-            "2.9.0": "bfc3d18460a6b969f473d9f5067457c13de349943352dee71e14615e4f3b5fab",
-            "2.9.1": "14a4d7d5ec8a8ed2bcf6861bd418ad5c015cbd38a33d4e777a4e82b15aaba416",
-            "3.0.0": "4f51df044b76eabafab2fbf420871d472c8f3a629da79ec5fac75c530d79f266",
-            "3.0.1": "4f51df044b76eabafab2fbf420871d472c8f3a629da79ec5fac75c530d79f266",
-            "3.0.2": "0d1a1c3b8255cc84090979079ca6d6e7a3391339c8b89e26a2b5de3994726d46",
-            "3.0.3": "0d1a1c3b8255cc84090979079ca6d6e7a3391339c8b89e26a2b5de3994726d46",
-            "3.0.4": "af256878a3ed52614189b6e2031e5c9cfd5aa57491a48b13905836fb8217069e",
-            "3.1.0": "fc4d5552e532b1f510808810b230b193c4aaf7a6b26375750dde03aeb2f1a302",
-            "3.1.1": "fc4d5552e532b1f510808810b230b193c4aaf7a6b26375750dde03aeb2f1a302",
-            "3.2.0": "fc4d5552e532b1f510808810b230b193c4aaf7a6b26375750dde03aeb2f1a302",
-            "3.2.1": "8fbe1031e8234fab32983f4e5afbc30831720db278418b5a4a48e50ad7611d15",
-            "3.3.0": "420f9f744643ee9e73f716e92d9136d92ad459b10748fe1a2f94fcafbfd6508d",
-            "3.4.0": "dc7fea63642f28330bb86d1f02c7bef24122d5b889400c2e421f76ce2fce9725",
-            "3.5.0": "c7d392694a1257cc4052e24f1f02e9bbd1431ab0d27b64c3d9a76b13f539130b",
-            "3.5.1": "8b73bdb35d8412d8be46a0046e3da0081ed1169c11d50fcb6bde65b7fb6c5dda",
-        }
-    }
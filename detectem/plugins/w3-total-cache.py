@@ -6,6 +6,7 @@ class W3TotalCachePlugin(Plugin):
     vendor = "Frederick Townes"
     homepage = "https://wordpress.org/plugins/w3-total-cache/"
     tags = ["wordpress"]
+    prerequisites = ["wordpress"]
 
     matchers = [
         {"header": ("X-Powered-By", r"W3 Total Cache/(?P<version>[0-9\.]+)")},
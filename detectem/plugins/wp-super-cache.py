@@ -5,6 +5,7 @@ class WPSuperCachePlugin(Plugin):
     name = "wp-super-cache"
     homepage = "https://wordpress.org/plugins/wp-super-cache/"
     tags = ["wordpress"]
+    prerequisites = ["wordpress"]
 
     matchers = [
         {
@@ -0,0 +1,104 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from detectem.utils import get_response_body_bytes, get_response_headers, get_url
+
+# Pseudo plugin names used for the work shared by every plugin
+URL_ENGINE = "<url-engine>"
+BODY_PREFILTER = "<body-prefilter>"
+FILE_HASH_INDEX = "<file-hash-index>"
+
+STAT_FIELDS = ["calls", "time", "bytes", "hits"]
+
+
+def get_scanned_bytes(matcher_type, entry):
+    """ Return the number of bytes a ``matcher_type`` matcher scans in ``entry``. """
+    if matcher_type == "url":
+        return len(get_url(entry))
+
+    if matcher_type == "header":
+        return sum(
+            len(value)
+            for values in get_response_headers(entry).values()
+            for value in values
+        )
+
+    return len(get_response_body_bytes(entry))
+
+
+class _NullMeasure:
+    """ Context manager used instead of :meth:`MatcherProfiler.measure`. """
+
+    def __enter__(self):
+        return {"hit": False}
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_MEASURE = _NullMeasure()
+
+
+class MatcherProfiler:
+    """Counters of matcher applications per plugin and matcher type.
+
+    For every ``(plugin, matcher type)`` it records number of calls,
+    cumulative time (in seconds), bytes scanned and number of hits.
+    The time of the URL engine, body prefilter and file hash lookups,
+    shared by every plugin, is recorded under pseudo plugin names.
+
+    """
+
+    def __init__(self):
+        self._stats = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+
+    def record(self, plugin_name, matcher_type, elapsed, n_bytes=0, hit=False):
+        stats = self._stats[(plugin_name, matcher_type)]
+        stats["calls"] += 1
+        stats["time"] += elapsed
+        stats["bytes"] += n_bytes
+        stats["hits"] += int(hit)
+
+    @contextmanager
+    def measure(self, plugin_name, matcher_type, entry):
+        """Record the block execution as a call of ``matcher_type``
+        on ``entry``. The block sets ``hit`` in the yielded dictionary.
+
+        """
+        result = {"hit": False}
+        start = time.perf_counter()
+
+        yield result
+
+        self.record(
+            plugin_name,
+            matcher_type,
+            time.perf_counter() - start,
+            get_scanned_bytes(matcher_type, entry),
+            result["hit"],
+        )
+
+    def get_stats(self):
+        """ Return list of ``[plugin, matcher type, stats]`` serializable to JSON. """
+        return [[p, t, dict(stats)] for (p, t), stats in self._stats.items()]
+
+    def merge(self, stats):
+        """ Add ``stats`` returned by :meth:`get_stats` of other profiler. """
+        for plugin_name, matcher_type, other in stats:
+            current = self._stats[(plugin_name, matcher_type)]
+            for field in STAT_FIELDS:
+                current[field] += other[field]
+
+    def get_report(self):
+        """ Return dictionary of plugin, matcher type and its stats with hit rate. """
+        report = defaultdict(dict)
+
+        for (plugin_name, matcher_type), stats in sorted(self._stats.items()):
+            report[plugin_name][matcher_type] = dict(
+                stats,
+                time=round(stats["time"], 6),
+                hit_rate=round(stats["hits"] / stats["calls"], 4),
+            )
+
+        return dict(report)
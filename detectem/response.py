@@ -1,64 +1,89 @@
-import base64
 import json
 import logging
+import os
 import re
-import urllib.parse
 from string import Template
 from typing import Optional
 
-import pkg_resources
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from detectem.exceptions import SplashError
-from detectem.settings import SPLASH_TIMEOUT
+from detectem.settings import (
+    BLOCKED_EXTENSIONS,
+    BLOCKED_MIMETYPES,
+    SPLASH_CONNECT_RETRIES,
+    SPLASH_MAX_WAIT,
+    SPLASH_MIN_WAIT,
+    SPLASH_POOL_SIZE,
+    SPLASH_TIMEOUT,
+)
 
 DEFAULT_CHARSET = "iso-8859-1"
 ERROR_STATUS_CODES = [400, 504]
 
+# Parts of URLs of resources that aren't analyzed (also sent to Splash)
+BLOCKED_URL_PARTS = [f".{ext}" for ext in BLOCKED_EXTENSIONS] + ["fonts.googleapis.com"]
+
 logger = logging.getLogger("detectem")
 
+# Sessions of the current process by Splash URL (see `get_session`)
+_sessions = {}
+_sessions_pid = None
 
-def is_url_allowed(url):
-    """Return ``True`` if ``url`` is not in ``blacklist``.
 
-    :rtype: bool
+def get_session(splash_url):
+    """Return the keep-alive session of the current process to ``splash_url``.
+
+    Connections aren't shared with forked processes, each one creates
+    its own sessions. Failed connections are retried, but requests
+    that reached Splash aren't.
+
+    :rtype: requests.Session
 
     """
-    blacklist = [
-        r"\.ttf",
-        r"\.woff",
-        r"fonts\.googleapis\.com",
-        r"\.png",
-        r"\.jpe?g",
-        r"\.gif",
-        r"\.svg",
-        r"\.otf",
-    ]
+    global _sessions_pid
 
-    for ft in blacklist:
-        if re.search(ft, url):
-            return False
+    if _sessions_pid != os.getpid():
+        _sessions.clear()
+        _sessions_pid = os.getpid()
 
-    return True
+    try:
+        return _sessions[splash_url]
+    except KeyError:
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=SPLASH_POOL_SIZE,
+            max_retries=Retry(total=SPLASH_CONNECT_RETRIES, read=0, backoff_factor=0.5),
+        )
+        session = _sessions[splash_url] = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
 
+        return session
 
-def is_valid_mimetype(response):
-    """Return ``True`` if the mimetype is not blacklisted.
+
+def is_url_allowed(url):
+    """Return ``True`` if ``url`` doesn't contain any of ``BLOCKED_URL_PARTS``.
 
     :rtype: bool
 
     """
-    blacklist = ["image/"]
+    return not any(part in url for part in BLOCKED_URL_PARTS)
 
+
+def is_valid_mimetype(response):
+    """Return ``True`` if the mimetype doesn't contain any of ``BLOCKED_MIMETYPES``.
+
+    :rtype: bool
+
+    """
     mimetype = response.get("mimeType")
     if not mimetype:
         return True
 
-    for bw in blacklist:
-        if bw in mimetype:
-            return False
-
-    return True
+    return not any(blocked in mimetype for blocked in BLOCKED_MIMETYPES)
 
 
 def get_charset(response):
@@ -83,6 +108,8 @@ def create_lua_script(plugins):
     :rtype: str
 
     """
+    import pkg_resources
+
     lua_template = pkg_resources.resource_string("detectem", "script.lua")
     template = Template(lua_template.decode("utf-8"))
 
@@ -125,19 +152,49 @@ def to_javascript_data(plugins):
     ]
 
 
-def get_response(url, plugins, timeout=SPLASH_TIMEOUT, splash_url=""):
+def get_response(
+    url,
+    plugins,
+    timeout=SPLASH_TIMEOUT,
+    splash_url="",
+    min_wait=SPLASH_MIN_WAIT,
+    max_wait=SPLASH_MAX_WAIT,
+    full_har=False,
+):
     """
     Return response with HAR, inline scritps and software detected by JS matchers.
 
+    The page is loaded for ``min_wait`` seconds and then until the network
+    is idle or the DOM detections are stable with no requests in flight,
+    but no more than ``max_wait`` (never less than ``min_wait``).
+
+    HAR entries only have request URL and response URL, headers,
+    mimetype and body unless ``full_har=True``.
+
     :rtype: dict
 
     """
-    lua_script = create_lua_script(plugins)
-    lua = urllib.parse.quote_plus(lua_script)
+    data = json.dumps(
+        {
+            "url": url,
+            "timeout": timeout,
+            "min_wait": min_wait,
+            "max_wait": max(min_wait, max_wait),
+            "blocked_urls": BLOCKED_URL_PARTS,
+            "blocked_mimetypes": BLOCKED_MIMETYPES,
+            "full_har": full_har,
+            "lua_source": plugins.get_lua_script(),
+        }
+    )
+    logger.debug("[+] Sending request of %(n)d bytes", {"n": len(data)})
 
     try:
-        page_url = f"{splash_url}/execute?url={url}&timeout={timeout}&lua_source={lua}"
-        res = requests.get(page_url, timeout=timeout)
+        res = get_session(splash_url).post(
+            f"{splash_url}/execute",
+            data=data,
+            headers={"Content-Type": "application/json"},
+            timeout=timeout,
+        )
     except requests.exceptions.ConnectionError:
         raise SplashError(f"Could not connect to Splash server at {splash_url}")
     except requests.exceptions.ReadTimeout:
@@ -223,10 +280,10 @@ def get_valid_har(har_data):
             continue
 
         if response.get("text"):
-            charset = get_charset(response)
-            response["text"] = base64.b64decode(response["text"]).decode(
-                charset, errors="ignore"
-            )
+            # Body is decoded from base64 when its bytes are needed
+            # and to text on first access (see `utils.get_response_body`)
+            response["encoding"] = "base64"
+            entry["detectem"] = {"charset": get_charset(response)}
         else:
             response["text"] = ""
 
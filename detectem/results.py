@@ -1,5 +1,4 @@
 from collections import defaultdict
-from distutils.version import LooseVersion
 
 from detectem.settings import GENERIC_TYPE, HINT_TYPE, INDICATOR_TYPE, VERSION_TYPE
 
@@ -31,6 +30,9 @@ class Result:
         return to_tuple(self) == to_tuple(o)
 
     def __lt__(self, o):
+        # Imported here since it's slow to import and only used to sort results
+        from distutils.version import LooseVersion
+
         def to_tuple(rt):
             return (rt.name, LooseVersion(rt.version or "0"), rt.type)
 
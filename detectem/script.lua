@@ -3,8 +3,57 @@ function main(splash)
   splash.response_body_enabled = true
 
   local url = splash.args.url
+  local min_wait = splash.args.min_wait or 0.5
+  local max_wait = splash.args.max_wait or 5
+  local wait_interval = splash.args.wait_interval or 0.25
+
+  -- Resources that detectem discards aren't downloaded
+  local blocked_urls = splash.args.blocked_urls or {}
+  local blocked_mimetypes = splash.args.blocked_mimetypes or {}
+
+  local function contains_any(value, parts)
+    for _, part in ipairs(parts) do
+      if string.find(value, part, 1, true) then
+        return true
+      end
+    end
+    return false
+  end
+
+  -- Requests in flight and events seen, to detect when the network is idle
+  local pending = 0
+  local events = 0
+  splash:on_request(function(request)
+    if contains_any(request.url, blocked_urls) then
+      request:abort()
+      return
+    end
+    pending = pending + 1
+    events = events + 1
+  end)
+  -- Header names are case-insensitive
+  local function get_header(headers, name)
+    name = string.lower(name)
+    for key, value in pairs(headers or {}) do
+      if string.lower(key) == name then
+        return value
+      end
+    end
+  end
+
+  splash:on_response_headers(function(response)
+    local mimetype = get_header(response.headers, 'Content-Type')
+    if mimetype and contains_any(mimetype, blocked_mimetypes) then
+      response:abort()
+    end
+  end)
+  splash:on_response(function(response)
+    pending = pending - 1
+    events = events + 1
+  end)
+
   splash:go(url)
-  assert(splash:wait(5))
+  assert(splash:wait(min_wait))
 
   local detectFunction = [[
     detect = function(){
@@ -44,8 +93,52 @@ function main(splash)
       return rs;
     }
   ]]
+  local isSettledFunction = [[
+    lastDetections = null;
+    isSettled = function(pending, idle){
+      if (document.readyState != 'complete') {
+        return false;
+      }
+
+      // Softwares detected from the DOM, compared with the previous poll
+      var detections = null;
+      try {
+        var rs = detect();
+        if (rs.length) {
+          detections = JSON.stringify(rs.map(function(s) {
+            return s.name + '@' + (s.version || '');
+          }).sort());
+        }
+      } catch (e) {}
+      var stable = detections !== null && detections === lastDetections;
+      lastDetections = detections;
+
+      // Nothing in flight and either no network activity in the last
+      // interval or the same (non-empty) detections as in the previous poll
+      return pending <= 0 && (idle || stable);
+    }
+  ]]
+
   splash:runjs('softwareData = $js_data;')
   splash:runjs(detectFunction)
+  splash:runjs(isSettledFunction)
+
+  -- Wait until the page is settled, but no more than max_wait
+  local waited = min_wait
+  while waited < max_wait do
+    local last_events = events
+    assert(splash:wait(wait_interval))
+    waited = waited + wait_interval
+
+    local idle = events == last_events
+    local ok, settled = pcall(
+      splash.evaljs, splash,
+      string.format('isSettled(%d, %s)', pending, tostring(idle))
+    )
+    if ok and settled then
+      break
+    end
+  end
 
   local softwares = {}
   local scripts = {}
@@ -69,8 +162,30 @@ function main(splash)
     errors['select_all'] = res
   end
 
+  -- Keep only the fields of HAR entries that detectem uses
+  local function trim_har(har)
+    local entries = {}
+    for _, entry in ipairs(har.log.entries) do
+      local content = entry.response.content or {}
+      entries[#entries+1] = {
+        request = {url = entry.request.url},
+        response = {
+          url = entry.response.url,
+          headers = entry.response.headers,
+          content = {mimeType = content.mimeType, text = content.text},
+        },
+      }
+    end
+    return {log = {entries = entries}}
+  end
+
+  local har = splash:har()
+  if not splash.args.full_har then
+    har = trim_har(har)
+  end
+
   return {
-    har = splash:har(),
+    har = har,
     softwares=softwares,
     scripts=scripts,
     errors=errors,
@@ -6,15 +6,36 @@ env.read_env()
 DEBUG = env.bool("DEBUG", False)
 PLUGIN_PACKAGES = env.list("DET_PLUGIN_PACKAGES", "detectem.plugins")
 
+# Cache of resource match results (entries in memory, 0 disables it)
+MATCH_CACHE_SIZE = env.int("DET_MATCH_CACHE_SIZE", 4096)
+MATCH_CACHE_DIR = env("DET_MATCH_CACHE_DIR", None)
+MATCH_CACHE_MAX_BYTES = env.int("DET_MATCH_CACHE_MAX_BYTES", 100 * 1024 * 1024)
+
+# Bytes of a body to skip body and XPath matchers on it (0 disables it)
+MATCHER_MAX_INPUT_SIZE = env.int("DET_MATCHER_MAX_INPUT_SIZE", 0)
+
+# Resources neither downloaded by Splash nor analyzed (URL extensions and mimetypes)
+BLOCKED_EXTENSIONS = env.list(
+    "DET_BLOCKED_EXTENSIONS", ["ttf", "woff", "otf", "png", "jpg", "jpeg", "gif", "svg"]
+)
+BLOCKED_MIMETYPES = env.list("DET_BLOCKED_MIMETYPES", ["image/"])
+
 # General Splash configuration
 SPLASH_URLS = env.list("SPLASH_URLS", ["http://localhost:8050"])
 SETUP_SPLASH = env.bool("SETUP_SPLASH", True)
 DOCKER_SPLASH_IMAGE = env("DOCKER_SPLASH_IMAGE", "scrapinghub/splash:latest")
 NUMBER_OF_SPLASH_INSTANCES = env.int("NUMBER_OF_SPLASH_INSTANCES", 3)
 
+# Keep-alive connections per Splash instance and retries of failed connections
+SPLASH_POOL_SIZE = env.int("SPLASH_POOL_SIZE", 2)
+SPLASH_CONNECT_RETRIES = env.int("SPLASH_CONNECT_RETRIES", 2)
+
 # Splash internal settings
 SPLASH_MAX_TIMEOUT = env.int("SPLASH_MAX_TIMEOUT", 120)
 SPLASH_TIMEOUT = 30
+# Seconds to wait for a page to settle (network idle or stable DOM detections)
+SPLASH_MIN_WAIT = env.float("SPLASH_MIN_WAIT", 0.5)
+SPLASH_MAX_WAIT = env.float("SPLASH_MAX_WAIT", 5.0)
 SPLASH_MAX_RETRIES = 3
 
 
@@ -11,6 +11,7 @@ from docker.client import DockerClient
 from docker.models.containers import Container
 
 from detectem.exceptions import DockerStartError
+from detectem.response import get_session
 from detectem.settings import (
     DOCKER_SPLASH_IMAGE,
     NUMBER_OF_SPLASH_INSTANCES,
@@ -74,7 +75,7 @@ class SplashManagerInterface(abc.ABC):
         # Get Splash url and clean container (call garbage collector)
         url: str = instance_data["url"]
         try:
-            requests.post(f"{url}/_gc")
+            get_session(url).post(f"{url}/_gc")
         except requests.exceptions.RequestException:
             pass
 
@@ -159,7 +160,7 @@ class DockerSplashManager(SplashManagerInterface):
 
         for t in [1, 2, 4, 6, 8, 10]:
             try:
-                requests.get(f"{url}/_ping")
+                get_session(url).get(f"{url}/_ping")
                 break
             except requests.exceptions.RequestException:
                 time.sleep(t)
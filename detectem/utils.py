@@ -1,9 +1,18 @@
+import base64
+import functools
 import hashlib
 import json
+import mmap
 import pprint
+import re
 
+from detectem.hashdb import HashDatabase
 from detectem.settings import CMD_OUTPUT, JSON_OUTPUT
 
+FILE_HASHES_DB = HashDatabase("data/file_hashes.db")
+ASCII_BYTES = bytes(range(128))
+NON_ASCII_RE = re.compile(rb"[^\x00-\x7f]")
+
 
 def get_most_complete_pm(pms):
     """Return plugin match with longer version, if not available
@@ -28,6 +37,14 @@ def get_most_complete_pm(pms):
     return selected_version or selected_presence
 
 
+def split_values(value):
+    """ Return list of values of a comma separated string or ``None``. """
+    if not value:
+        return None
+
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
 def create_printer(oformat):
     if oformat == CMD_OUTPUT:
         return pprint.pprint
@@ -47,25 +64,220 @@ def get_url(entry):
         return entry["request"]["url"]
 
 
+def is_response_body_decoded(entry):
+    """ Return ``False`` if ``entry`` response body is still base64 encoded. """
+    return entry["response"]["content"].get("encoding") != "base64"
+
+
 def get_response_body(entry):
-    return entry["response"]["content"]["text"]
+    """Return ``entry`` response body text.
+
+    Base64 encoded bodies are decoded with the entry charset
+    on first access and the content is updated with the text.
+    Their bytes are dropped then, after hashing them.
+
+    """
+    content = entry["response"]["content"]
 
+    if not is_response_body_decoded(entry):
+        metadata = entry["detectem"]
+        body = get_response_body_bytes(entry)
+        get_response_body_hash(entry)
+
+        content["text"] = body.decode(metadata.get("charset", "utf-8"), errors="ignore")
+        del content["encoding"]
+        metadata.pop("body", None)
+
+    return content["text"]
+
+
+def get_response_body_bytes(entry):
+    """Return ``entry`` response body as bytes.
+
+    Base64 encoded bodies are decoded to their original bytes and kept
+    in the metadata until the text is decoded. Otherwise the text
+    is encoded with UTF-8, without keeping a second copy of the body.
+
+    """
+    metadata = entry.setdefault("detectem", {})
+
+    try:
+        return metadata["body"]
+    except KeyError:
+        if is_response_body_decoded(entry):
+            return get_response_body(entry).encode("utf-8")
 
-def get_version_via_file_hashes(plugin, entry):
-    file_hashes = getattr(plugin, "file_hashes", {})
-    if not file_hashes:
-        return
+        body = metadata["body"] = base64.b64decode(entry["response"]["content"]["text"])
+        return body
 
-    url = get_url(entry)
-    body = get_response_body(entry).encode("utf-8")
-    for file, hash_dict in file_hashes.items():
-        if file not in url:
-            continue
 
-        m = hashlib.sha256()
-        m.update(body)
-        h = m.hexdigest()
+@functools.lru_cache(maxsize=None)
+def is_ascii_compatible(charset):
+    """ Return ``True`` if ASCII text has the same bytes in ``charset``. """
+    try:
+        return ASCII_BYTES.decode(charset) == ASCII_BYTES.decode("ascii")
+    except (LookupError, UnicodeDecodeError):
+        return False
+
+
+def get_ascii_response_body(entry):
+    """Return ``entry`` response body bytes if they only contain ASCII text,
+    otherwise return ``None``.
+
+    ASCII regexes applied on these bytes match the same as if they were
+    applied on the decoded text.
+
+    """
+    metadata = entry.setdefault("detectem", {})
+
+    # Bytes aren't kept once the text is decoded, then the text is used
+    if "body" not in metadata and is_response_body_decoded(entry):
+        return None
+
+    if "ascii" not in metadata:
+        body = get_response_body_bytes(entry)
+        metadata["ascii"] = (
+            is_ascii_compatible(metadata.get("charset", "utf-8"))
+            and NON_ASCII_RE.search(body) is None
+        )
+
+    if metadata["ascii"]:
+        return get_response_body_bytes(entry)
+
+    return None
+
+
+def get_response_body_hash(entry):
+    """Return SHA-256 hex digest of ``entry`` response body.
+
+    It's computed once and kept in the entry metadata.
+
+    """
+    metadata = entry.setdefault("detectem", {})
+
+    try:
+        return metadata["sha256"]
+    except KeyError:
+        h = hashlib.sha256(get_response_body_bytes(entry)).hexdigest()
+        metadata["sha256"] = h
+        return h
+
+
+def get_response_headers(entry):
+    """Return a case-insensitive index of ``entry`` response headers,
+    with lowercase header name as key and the list of its values as value.
+
+    It's built once and kept in the entry metadata.
+
+    """
+    metadata = entry.setdefault("detectem", {})
+
+    try:
+        return metadata["headers"]
+    except KeyError:
+        index = {}
+        for header in entry["response"].get("headers", []):
+            if "value" in header:
+                index.setdefault(header["name"].lower(), []).append(header["value"])
+
+        metadata["headers"] = index
+        return index
+
+
+class FileHashIndex:
+    """Inverted index of the file hashes of every plugin.
+
+    It maps the SHA-256 hex digest of a file to the list of
+    ``(plugin name, version)`` tuples that have it. Hashes come from
+    the shared hash ``database`` and from the ``file_hashes`` attribute
+    of the plugins, in plugin order.
+
+    """
+
+    def __init__(self, plugins, database=FILE_HASHES_DB):
+        self._index = {}
+        self._plugin_names = set()
+        self.database = database
+
+        for plugin in plugins:
+            self._plugin_names.add(plugin.name)
+
+            for hash_dict in getattr(plugin, "file_hashes", {}).values():
+                for version, version_hash in hash_dict.items():
+                    self._index.setdefault(version_hash, []).append(
+                        (plugin.name, version)
+                    )
+
+    def __len__(self):
+        return len(self._index) + len(self.database)
+
+    @property
+    def checksum(self):
+        return self.database.checksum
+
+    def get(self, file_hash):
+        """ Return the first version of every plugin having ``file_hash``. """
+        versions = {}
+
+        for plugin_name, version in self._index.get(file_hash, []):
+            versions.setdefault(plugin_name, version)
+
+        for plugin_name, version in self.database.get(file_hash):
+            # Skip plugins not present in the collection
+            if plugin_name in self._plugin_names:
+                versions.setdefault(plugin_name, version)
+
+        return versions
+
+    def get_version(self, plugin_name, entry):
+        """ Return the version of ``plugin_name`` identified by ``entry`` body. """
+        if not self:
+            return None
+
+        return self.get(get_response_body_hash(entry)).get(plugin_name)
+
+
+class SortedIndex:
+    """Read-only lookup table stored in a package data file.
+
+    Every line of the file is ``key<TAB>value`` and lines are sorted by key,
+    then lookups are binary searches over the memory mapped file.
+    The file is only opened on the first lookup.
+
+    """
+
+    def __init__(self, resource_name):
+        self.resource_name = resource_name
+        self._data = None
+
+    def _load(self):
+        import pkg_resources
+
+        filename = pkg_resources.resource_filename("detectem", self.resource_name)
+        with open(filename, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, key, default=None):
+        if self._data is None:
+            self._load()
+
+        data = self._data
+        bkey = key.encode("utf-8")
+        lo, hi = 0, len(data)
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = data.rfind(b"\n", 0, mid) + 1
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = len(data)
+
+            line_key, _, value = data[start:end].partition(b"\t")
+            if line_key < bkey:
+                lo = end + 1
+            elif line_key > bkey:
+                hi = start
+            else:
+                return value.decode("utf-8") or default
 
-        for version, version_hash in hash_dict.items():
-            if h == version_hash:
-                return version
+        return default
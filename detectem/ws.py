@@ -1,9 +1,11 @@
 import json
 import sys
 
-from detectem.cli import get_detection_results
+from detectem.cli import get_detection_results, get_invalid_filter
 from detectem.exceptions import NoPluginsError, SplashError
+from detectem.plugin import load_plugins
 from detectem.settings import DEBUG, SPLASH_TIMEOUT
+from detectem.utils import split_values
 
 try:
     import bottle
@@ -29,8 +31,22 @@ def do_detection():
     if not timeout:
         timeout = SPLASH_TIMEOUT
 
+    # plugins and tags are optional, they're comma separated lists
+    plugin_names = split_values(request.forms.get("plugins"))
+    tags = split_values(request.forms.get("tags"))
+
+    invalid = get_invalid_filter(plugin_names, tags)
+    if invalid:
+        return json.dumps({"error": invalid[1]})
+
     try:
-        result = get_detection_results(url, timeout=timeout, metadata=metadata)
+        result = get_detection_results(
+            url,
+            timeout=timeout,
+            metadata=metadata,
+            plugin_names=plugin_names,
+            tags=tags,
+        )
     except (SplashError, NoPluginsError) as e:
         result = {"error": e.msg}
 
@@ -39,6 +55,10 @@ def do_detection():
 
 def main():
     bottle.debug(DEBUG)
+
+    # Build the plugin registry once, it's reused by every request
+    load_plugins()
+
     run(host="0.0.0.0", port=5723)
 
 
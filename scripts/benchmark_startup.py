@@ -0,0 +1,64 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import click
+
+LIST_PLUGINS_CMD = [sys.executable, "-m", "detectem.cli", "--list-plugins"]
+
+# Detection over a saved HAR file (see `det --save-har`), without Splash
+SINGLE_URL_CODE = """
+import json, sys
+from detectem.core import Detector
+from detectem.plugin import load_plugins
+from detectem.utils import get_url
+
+har = json.load(open(sys.argv[1]))
+response = {"har": har, "scripts": [], "softwares": []}
+Detector(response, load_plugins(), get_url(har[0])).get_results()
+"""
+
+
+def run_command(cmd, env, runs):
+    """ Return list of wall times (in seconds) of running ``cmd`` ``runs`` times. """
+    times = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def print_times(label, times):
+    print(
+        "{:<30} mean: {:.3f}s  min: {:.3f}s  max: {:.3f}s".format(
+            label, statistics.mean(times), min(times), max(times)
+        )
+    )
+
+
+@click.command()
+@click.option("--runs", default=10, type=int, help="Number of runs per case.")
+@click.option(
+    "--har",
+    default=None,
+    type=click.Path(exists=True),
+    help="HAR file saved with `det --save-har` to benchmark a single URL run.",
+)
+def main(runs, har):
+    cases = [("list-plugins", LIST_PLUGINS_CMD)]
+    if har:
+        cases.append(("single-url", [sys.executable, "-c", SINGLE_URL_CODE, har]))
+
+    for name, cmd in cases:
+        print_times(name, run_command(cmd, os.environ, runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import glob
+import os
+import statistics
+import time
+
+import click
+from yaml import FullLoader, load
+
+from detectem.matchers import UrlMatcher, UrlMatcherEngine
+from detectem.plugin import load_plugins
+
+FIXTURES_DIR = os.path.join(
+    os.path.dirname(__file__), os.pardir, "tests", "plugins", "fixtures"
+)
+
+# Usual shapes of resource URLs of a page, most of them not matching any plugin
+SYNTHETIC_URLS = [
+    "https://cdn.domain{i}.tld/assets/js/app.{i}.min.js",
+    "https://cdnjs.cloudflare.com/ajax/libs/lib{i}/{i}.0.1/lib{i}.min.js",
+    "https://static.domain.tld/wp-content/themes/theme{i}/style.css?ver={i}",
+    "https://www.googletagmanager.com/gtag/js?id=UA-{i}",
+    "https://domain.tld/static/chunk-{i}.js",
+    "https://ajax.googleapis.com/ajax/libs/jquery/3.{i}.1/jquery.min.js",
+]
+
+
+def get_fixture_urls():
+    """ Return URLs of URL matcher fixtures of every plugin. """
+    urls = []
+
+    for path in glob.glob(os.path.join(FIXTURES_DIR, "*.yml")):
+        for plugin_data in load(open(path), Loader=FullLoader):
+            urls += [m["url"] for m in plugin_data["matches"] if "url" in m]
+
+    return urls
+
+
+def get_synthetic_urls(n_urls):
+    return [SYNTHETIC_URLS[i % len(SYNTHETIC_URLS)].format(i=i) for i in range(n_urls)]
+
+
+def run_engine(engine, entries):
+    for entry in entries:
+        engine.get_info(entry)
+
+
+def run_per_plugin(plugins, entries):
+    plugin_matchers = [
+        p.get_matchers("url") for p in plugins.get_all() if p.get_matchers("url")
+    ]
+
+    for entry in entries:
+        for matchers in plugin_matchers:
+            UrlMatcher.get_info(entry, *matchers)
+
+
+def measure(func, args, runs):
+    """ Return list of times (in seconds) of calling ``func`` ``runs`` times. """
+    times = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def print_times(label, times):
+    print(
+        "{:<40} mean: {:.2f}ms  min: {:.2f}ms".format(
+            label, statistics.mean(times) * 1000, min(times) * 1000
+        )
+    )
+
+
+@click.command()
+@click.option("--runs", default=20, type=int, help="Number of runs per case.")
+@click.option("--synthetic", default=300, type=int, help="Number of synthetic URLs.")
+def main(runs, synthetic):
+    plugins = load_plugins()
+    engine = UrlMatcherEngine(plugins.get_all())
+
+    n_plugins = len([p for p in plugins.get_all() if p.get_matchers("url")])
+    print(f"Plugins with URL matchers: {n_plugins}")
+
+    cases = [
+        ("fixtures", get_fixture_urls()),
+        ("synthetic", get_synthetic_urls(synthetic)),
+    ]
+    for name, urls in cases:
+        entries = [{"request": {"url": url}, "response": {"url": url}} for url in urls]
+
+        print_times(
+            f"{name} ({len(urls)} URLs) engine",
+            measure(run_engine, [engine, entries], runs),
+        )
+        print_times(
+            f"{name} ({len(urls)} URLs) per plugin",
+            measure(run_per_plugin, [plugins, entries], runs),
+        )
+
+
+if __name__ == "__main__":
+    main()
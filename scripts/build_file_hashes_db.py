@@ -0,0 +1,37 @@
+import json
+import os
+
+import click
+
+from detectem.hashdb import build_hash_database
+
+ROOT_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+DATA_DIRECTORY = os.path.join(ROOT_DIRECTORY, "detectem", "data")
+
+
+@click.command()
+@click.option(
+    "--source",
+    default=os.path.join(DATA_DIRECTORY, "file_hashes.jl"),
+    type=click.Path(exists=True),
+    help="JSON lines file with plugin, file, version and hash of every file.",
+)
+@click.option(
+    "--output",
+    default=os.path.join(DATA_DIRECTORY, "file_hashes.db"),
+    type=click.Path(),
+    help="Hash database to create.",
+)
+def main(source, output):
+    """ Build the hash database used to detect versions through file hashes. """
+    with open(source) as f:
+        records = [json.loads(line) for line in f]
+
+    with open(output, "wb") as f:
+        f.write(build_hash_database(records))
+
+    print("Created hash database with {} files at {}".format(len(records), output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import json
+import os
+
+import click
+
+ROOT_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+DATA_DIRECTORY = os.path.join(ROOT_DIRECTORY, "detectem", "data")
+
+
+@click.command()
+@click.option(
+    "--source",
+    default=os.path.join(DATA_DIRECTORY, "wordpress.jl"),
+    type=click.Path(exists=True),
+    help="JSON lines file with name and vendor of every plugin.",
+)
+@click.option(
+    "--output",
+    default=os.path.join(DATA_DIRECTORY, "wordpress.idx"),
+    type=click.Path(),
+    help="Index file to create.",
+)
+def main(source, output):
+    """ Build the sorted index used by the wordpress generic plugin. """
+    plugins = {}
+
+    with open(source) as f:
+        for line in f:
+            data = json.loads(line)
+            plugins[data["name"].encode("utf-8")] = (data["vendor"] or "").encode(
+                "utf-8"
+            )
+
+    with open(output, "wb") as f:
+        for name in sorted(plugins):
+            f.write(name + b"\t" + plugins[name] + b"\n")
+
+    print("Created index with {} plugins at {}".format(len(plugins), output))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import hashlib
 import io
+import json
 import logging
 import os
 import pprint
@@ -84,9 +85,19 @@ def get_files_from_github(user_and_repo, filedir, regex, prefer_tags):
     "--regex", default=FILE_REGEX, type=str, help="regex to select the releases"
 )
 @click.option("--prefer-tags", is_flag=True, help="prefer tags over releases")
+@click.option(
+    "--output",
+    default=None,
+    type=click.Path(),
+    help="JSON lines file to append the hashes (see build_file_hashes_db.py)",
+)
+@click.option("--plugin", default=None, type=str, help="plugin name for --output")
 @click_log.simple_verbosity_option(logger, default="error")
 @click.argument("filepath", type=str)
-def main(github, directory, regex, filepath, prefer_tags):
+def main(github, directory, regex, filepath, prefer_tags, output, plugin):
+    if output and not plugin:
+        raise click.UsageError("--plugin is required with --output")
+
     directories = []
 
     if github:
@@ -113,7 +124,16 @@ def main(github, directory, regex, filepath, prefer_tags):
             h = m.hexdigest()
             hashes[version] = h
 
-    pprint.pprint({filepath: hashes})
+    if not output:
+        pprint.pprint({filepath: hashes})
+        return
+
+    with open(output, "a") as f:
+        for version, h in hashes.items():
+            record = {"plugin": plugin, "file": filepath, "version": version, "hash": h}
+            f.write(json.dumps(record) + "\n")
+
+    logger.info(f"[+] Added {len(hashes)} hashes to {output}")
 
 
 if __name__ == "__main__":
@@ -30,6 +30,7 @@ setup(
     entry_points={"console_scripts": ["det=detectem.cli:main"]},
     include_package_data=True,
     install_requires=requirements,
+    extras_require={"ahocorasick": ["pyahocorasick"]},
     python_requires=">=3.6",
     license="MIT",
     zip_safe=False,
@@ -4,7 +4,7 @@ from importlib.util import find_spec
 import dukpy
 import pytest
 
-from detectem.core import MATCHERS
+from detectem.matchers import MATCHERS
 from detectem.plugin import load_plugins
 from detectem.settings import PLUGIN_PACKAGES
 from tests import create_pm, load_from_yaml
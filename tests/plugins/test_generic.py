@@ -1,6 +1,6 @@
 import pytest
 
-from detectem.core import MATCHERS
+from detectem.matchers import MATCHERS
 from detectem.plugin import GenericPlugin, load_plugins
 from tests import create_pm
 
@@ -39,7 +39,9 @@ class TestDockerSplashManager:
         class PingResponse:
             status_code = 200
 
-        with patch.object(requests, "get", return_value=lambda u: PingResponse()):
+        with patch.object(
+            requests.Session, "get", return_value=lambda u: PingResponse()
+        ):
             assert dm._wait_container(container_name) == None
 
     def test_wait_container_with_exception(self):
@@ -0,0 +1,44 @@
+import os
+
+from detectem.cache import MatchCache
+
+
+def test_match_cache_lru():
+    cache = MatchCache(2)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    # "b" is the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    assert cache.stats() == {"hits": 3, "misses": 1, "entries": 2}
+
+
+def test_match_cache_on_disk(tmpdir):
+    directory = str(tmpdir)
+
+    cache = MatchCache(10, directory=directory)
+    cache.set("a", {"results": [], "plugins": ["foo"]})
+
+    # Other process uses the same directory
+    other_cache = MatchCache(10, directory=directory)
+    assert other_cache.get("a") == {"results": [], "plugins": ["foo"]}
+    assert other_cache.get("b") is None
+    assert other_cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_match_cache_on_disk_eviction(tmpdir):
+    directory = str(tmpdir)
+
+    cache = MatchCache(10, directory=directory, max_bytes=30)
+    cache.set("a", "x" * 10)
+    os.utime(os.path.join(directory, "a"), (0, 0))
+    cache.set("b", "y" * 10)
+    cache.set("c", "z" * 10)
+
+    assert sorted(os.listdir(directory)) == ["b", "c"]
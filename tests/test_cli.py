@@ -1,6 +1,13 @@
+import json
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+
 import pytest
+from click.testing import CliRunner
 
-from detectem.cli import get_detection_results
+from detectem.cli import get_detection_results, main
 from detectem.exceptions import NoPluginsError, SplashError
 
 
@@ -26,8 +33,91 @@ def test_get_detection_ok(mocker):
         def get_results(**kwargs):
             return [1, 2, 3]
 
-    mocker.patch("detectem.cli.get_response", return_value=1)
+    mocker.patch("detectem.cli.get_response", return_value={"har": []})
     mocker.patch("detectem.cli.Detector", return_value=FakeDetector)
 
     rs = get_detection_results("http://domain.tld", timeout=30, metadata=True)
     assert rs == {"url": "http://domain.tld", "softwares": [1, 2, 3]}
+
+
+@pytest.fixture(autouse=True)
+def restore_log_level():
+    """ Restore the level of the logger set by the verbosity option of ``main``. """
+    logger = logging.getLogger("detectem")
+    level = logger.level
+    yield
+    logger.setLevel(level)
+
+
+class FakeSplashManager:
+    handles_errors = False
+
+    def __init__(self):
+        self.sem = threading.Semaphore()
+
+    def setup(self, n_instances):
+        self.n_instances = n_instances
+
+    def get_number_of_available_instances(self):
+        return self.n_instances
+
+    @contextmanager
+    def assign_instance(self):
+        yield "splash-0", "http://splash:8050"
+
+    def teardown(self):
+        pass
+
+
+class FakeProcess:
+    """ Run the worker in the current process when it's joined. """
+
+    def __init__(self, target, args):
+        self.target = target
+        self.args = args
+
+    def start(self):
+        pass
+
+    def join(self):
+        self.target(*self.args)
+
+
+@pytest.mark.parametrize(
+    "options,plugin_names,tags",
+    [
+        (["--plugins", "jquery,vue"], ["jquery", "vue"], None),
+        (["--tags", "cms"], None, ["cms"]),
+    ],
+)
+def test_main_with_plugins_and_tags(mocker, options, plugin_names, tags):
+    mocker.patch("detectem.cli.get_splash_manager", return_value=FakeSplashManager())
+    mocker.patch("detectem.cli.Process", FakeProcess)
+    mocker.patch("detectem.cli.Queue", queue.Queue)
+    gdr = mocker.patch(
+        "detectem.cli.get_detection_results",
+        return_value={"url": "http://domain.tld", "softwares": []},
+    )
+
+    result = CliRunner().invoke(
+        main, options + ["--format", "json", "http://domain.tld"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.output) == [{"url": "http://domain.tld", "softwares": []}]
+    assert gdr.call_args[1]["plugin_names"] == plugin_names
+    assert gdr.call_args[1]["tags"] == tags
+
+
+@pytest.mark.parametrize(
+    "options,error",
+    [
+        (["--plugins", "invalid"], "Invalid plugin: invalid"),
+        (["--tags", "invalid"], "Invalid tag: invalid"),
+    ],
+)
+def test_main_with_invalid_plugins_and_tags(options, error):
+    result = CliRunner().invoke(main, options + ["http://domain.tld"])
+
+    assert result.exit_code == 2
+    assert error in result.output
@@ -1,6 +1,10 @@
 import pytest
 
-from detectem.core import HarProcessor
+import detectem.matchers
+from detectem.cache import MatchCache
+from detectem.core import Detector, HarProcessor
+from detectem.plugin import Plugin, PluginCollection
+from detectem.profiling import BODY_PREFILTER, URL_ENGINE, MatcherProfiler
 from detectem.settings import INLINE_SCRIPT_ENTRY, MAIN_ENTRY
 
 
@@ -31,6 +35,10 @@ class TestHarProcessor:
             ({"response": {}}, None),
             ({"response": {"headers": [{"name": "any"}]}}, None),
             (HAR_URL_REDIRECT[0], "/new/default.html"),
+            (
+                {"response": {"headers": [{"name": "location", "value": "/new"}]}},
+                "/new",
+            ),
         ],
     )
     def test__get_location(self, entry, result):
@@ -53,3 +61,224 @@ class TestHarProcessor:
     def test_mark_entries(self, entries, index):
         HarProcessor().mark_entries(entries)
         assert entries[index]["detectem"]["type"] == MAIN_ENTRY
+
+
+def create_entry(url, text=""):
+    return {
+        "request": {"url": url},
+        "response": {"url": url, "content": {"text": text}},
+    }
+
+
+class TestDetector:
+    URL = "http://domain.tld/"
+
+    class FooPlugin(Plugin):
+        name = "foo"
+        homepage = "http://foo.tld"
+        tags = []
+        matchers = [
+            {"url": r"/foo-(?P<version>[0-9\.]+)\.js"},
+            {"body": r"Foo v(?P<version>[0-9\.]+)"},
+        ]
+
+    class BarPlugin(Plugin):
+        name = "bar"
+        homepage = "http://bar.tld"
+        tags = []
+        matchers = [{"url": lambda v: "1.0" if "/bar.js" in v else None}]
+
+    class BazPlugin(Plugin):
+        name = "baz"
+        homepage = "http://baz.tld"
+        tags = []
+        matchers = [{"url": r"/baz\.js"}]
+        file_hashes = {
+            "/baz.js": {
+                "1.0": "a568d93bc037ad145a1659f74746691bbdec81863ff79048ed13bb83afee76b2"
+            }
+        }
+
+    class QuxPlugin(Plugin):
+        name = "qux"
+        homepage = "http://qux.tld"
+        tags = []
+        prerequisites = ["foo", "unknown"]
+        matchers = [
+            {"url": r"/qux-(?P<version>[0-9\.]+)\.js"},
+            {"body": r"Qux v(?P<version>[0-9\.]+)"},
+        ]
+
+    def _get_results(self, har, match_cache=None, metadata=False):
+        plugins = PluginCollection()
+        for klass in [self.FooPlugin, self.BarPlugin, self.BazPlugin, self.QuxPlugin]:
+            plugin = klass()
+            plugin.compile_matchers()
+            plugins.add(plugin)
+
+        response = {"har": har, "softwares": [], "scripts": []}
+        detector = Detector(response, plugins, self.URL, match_cache=match_cache)
+        return detector.get_results(metadata=metadata)
+
+    @pytest.mark.parametrize(
+        "har,results",
+        [
+            ([], []),
+            (
+                [create_entry(URL), create_entry(URL + "foo-1.2.js")],
+                [{"name": "foo", "version": "1.2"}],
+            ),
+            (
+                [create_entry(URL), create_entry(URL + "lib.js", "Foo v2.0")],
+                [{"name": "foo", "version": "2.0"}],
+            ),
+            (
+                [create_entry(URL), create_entry(URL + "bar.js")],
+                [{"name": "bar-1.0", "version": "1.0"}],
+            ),
+            (
+                [create_entry(URL), create_entry(URL + "baz.js", "baz code")],
+                [{"name": "baz", "version": "1.0"}],
+            ),
+            (
+                [create_entry(URL), create_entry(URL + "baz.js", "other code")],
+                [{"name": "baz"}],
+            ),
+            # File identified by its hash only
+            (
+                [create_entry(URL), create_entry(URL + "all.js", "baz code")],
+                [{"name": "baz", "version": "1.0"}],
+            ),
+            # Body matchers of plugins with prerequisites need them detected
+            ([create_entry(URL), create_entry(URL + "lib.js", "Qux v1.0")], []),
+            (
+                [
+                    create_entry(URL),
+                    create_entry(URL + "lib.js", "Qux v1.0"),
+                    create_entry(URL + "foo-1.2.js"),
+                ],
+                [{"name": "foo", "version": "1.2"}, {"name": "qux", "version": "1.0"}],
+            ),
+            # URL match of a plugin with prerequisites is merged with its body match
+            (
+                [create_entry(URL), create_entry(URL + "qux-1.2.js", "Qux v1.2.1")],
+                [{"name": "qux", "version": "1.2"}],
+            ),
+            (
+                [
+                    create_entry(URL),
+                    create_entry(URL + "qux-1.2.js", "Qux v1.2.1"),
+                    create_entry(URL + "foo-1.2.js"),
+                ],
+                [
+                    {"name": "foo", "version": "1.2"},
+                    {"name": "qux", "version": "1.2.1"},
+                ],
+            ),
+            # URL and body matchers aren't applied on main entry
+            ([create_entry(URL + "foo-1.2.js", "Foo v2.0")], []),
+        ],
+    )
+    def test_get_results(self, har, results):
+        assert self._get_results(har) == results
+
+    def test_get_results_with_match_cache(self):
+        match_cache = MatchCache(10)
+        har = [create_entry(self.URL), create_entry(self.URL + "baz.js", "baz code")]
+
+        results = self._get_results(har, match_cache, metadata=True)
+        assert match_cache.stats() == {"hits": 0, "misses": 1, "entries": 1}
+
+        cached_har = [
+            create_entry(self.URL),
+            create_entry(self.URL + "baz.js", "baz code"),
+        ]
+        assert self._get_results(cached_har, match_cache, metadata=True) == results
+        assert match_cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+        # Different content is a different key
+        other_har = [
+            create_entry(self.URL),
+            create_entry(self.URL + "baz.js", "other code"),
+        ]
+        assert self._get_results(other_har, match_cache) == [{"name": "baz"}]
+        assert match_cache.stats() == {"hits": 1, "misses": 2, "entries": 2}
+
+        # Deferred matchers are cached apart
+        foo_har = [
+            create_entry(self.URL),
+            create_entry(self.URL + "foo-1.2.js", "Qux v1.0"),
+        ]
+        assert len(self._get_results(foo_har, match_cache)) == 2
+        assert match_cache.stats() == {"hits": 1, "misses": 4, "entries": 4}
+
+    def test_get_results_with_oversized_bodies_are_not_cached(self, monkeypatch):
+        monkeypatch.setattr(detectem.matchers, "MATCHER_MAX_INPUT_SIZE", 4)
+        match_cache = MatchCache(10)
+        har = [create_entry(self.URL), create_entry(self.URL + "lib.js", "Foo v2.0")]
+
+        assert self._get_results(har, match_cache) == []
+        assert match_cache.stats() == {"hits": 0, "misses": 1, "entries": 0}
+
+    def test_get_hints_with_filtered_plugins(self, caplog):
+        class HintPlugin(Plugin):
+            name = "hint"
+            homepage = "http://hint.tld"
+            tags = ["cms"]
+            matchers = []
+            hints = ["foo", "invalid"]
+
+        plugins = PluginCollection()
+        for plugin in [self.FooPlugin(), HintPlugin()]:
+            plugins.add(plugin)
+        plugins = plugins.filter(tags=["cms"])
+
+        response = {"har": [], "softwares": [], "scripts": []}
+        detector = Detector(response, plugins, self.URL)
+
+        assert detector.get_hints(plugins.get("hint")) == []
+        # Only the invalid plugin is reported, "foo" was excluded
+        assert "foo" not in caplog.text
+        assert "hints an invalid plugin: invalid" in caplog.text
+
+    def test_get_results_with_prerequisites_scans_entries_once(self):
+        plugins = PluginCollection()
+        for klass in [self.FooPlugin, self.QuxPlugin]:
+            plugin = klass()
+            plugin.compile_matchers()
+            plugins.add(plugin)
+
+        har = [
+            create_entry(self.URL),
+            create_entry(self.URL + "qux-1.2.js", "Qux v1.2.1"),
+            create_entry(self.URL + "foo-1.2.js"),
+        ]
+        response = {"har": har, "softwares": [], "scripts": []}
+        profiler = MatcherProfiler()
+        results = Detector(response, plugins, self.URL, profiler=profiler).get_results()
+
+        assert results == [
+            {"name": "foo", "version": "1.2"},
+            {"name": "qux", "version": "1.2.1"},
+        ]
+        report = profiler.get_report()
+        assert report[URL_ENGINE]["url"]["calls"] == 2
+        assert report[BODY_PREFILTER]["body"]["calls"] == 2
+        assert report["qux"]["body"]["hits"] == 1
+
+    def test_get_results_with_profiler(self):
+        plugins = PluginCollection()
+        for klass in [self.FooPlugin, self.BarPlugin]:
+            plugin = klass()
+            plugin.compile_matchers()
+            plugins.add(plugin)
+
+        har = [create_entry(self.URL), create_entry(self.URL + "lib.js", "Foo v2.0")]
+        response = {"har": har, "softwares": [], "scripts": []}
+        profiler = MatcherProfiler()
+        Detector(response, plugins, self.URL, profiler=profiler).get_results()
+
+        report = profiler.get_report()
+        assert report["foo"]["body"]["hits"] == 1
+        assert report[URL_ENGINE]["url"]["calls"] == 1
+        assert report[BODY_PREFILTER]["body"]["bytes"] == len("Foo v2.0")
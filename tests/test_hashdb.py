@@ -0,0 +1,48 @@
+import hashlib
+
+import pkg_resources
+import pytest
+
+from detectem.hashdb import HashDatabase, build_hash_database
+
+
+def get_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+@pytest.fixture
+def database(tmpdir, monkeypatch):
+    records = [
+        {"plugin": "foo", "version": "1.0", "hash": get_hash(b"foo 1")},
+        {"plugin": "foo", "version": "1.1", "hash": get_hash(b"foo 1")},
+        {"plugin": "bar", "version": "2.0", "hash": get_hash(b"foo 1")},
+    ] + [
+        {"plugin": "baz", "version": str(i), "hash": get_hash(str(i).encode())}
+        for i in range(100)
+    ]
+
+    path = tmpdir.join("file_hashes.db")
+    path.write_binary(build_hash_database(records))
+    monkeypatch.setattr(pkg_resources, "resource_filename", lambda p, r: str(path))
+
+    return HashDatabase("data/file_hashes.db")
+
+
+def test_hash_database(database):
+    assert len(database) == 101
+    assert database.get(get_hash(b"foo 1")) == [
+        ("foo", "1.0"),
+        ("foo", "1.1"),
+        ("bar", "2.0"),
+    ]
+    assert database.get(get_hash(b"42")) == [("baz", "42")]
+    assert database.get(get_hash(b"unknown")) == []
+
+
+def test_hash_database_bloom_filter(database):
+    unknown = [get_hash(str(i).encode()) for i in range(100, 1100)]
+    database.get(unknown[0])
+
+    rejected = [h for h in unknown if not database._might_contain(bytes.fromhex(h))]
+
+    assert len(rejected) > 900
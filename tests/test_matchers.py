@@ -2,15 +2,30 @@ import re
 
 import pytest
 
+import detectem.matchers
 from detectem.matchers import (
+    MATCHERS,
     BodyMatcher,
+    BodyPrefilter,
+    EntryRouter,
     HeaderMatcher,
+    MatcherPlans,
     UrlMatcher,
+    UrlMatcherEngine,
     XPathMatcher,
+    compile_matcher,
+    extract_info,
     extract_name,
     extract_named_group,
     extract_version,
+    get_bytes_regex,
+    get_regex_warnings,
+    get_required_literal,
+    get_selector,
+    is_over_budget,
 )
+from detectem.plugin import GenericPlugin, Plugin, PluginCollection
+from detectem.settings import INLINE_SCRIPT_ENTRY, MAIN_ENTRY, RESOURCE_ENTRY
 from tests import create_pm
 
 
@@ -69,6 +84,104 @@ class TestMatcherHelpers:
         matcher = r"plugin (?P<name>\w+)"
         assert extract_name("plugin example", matcher) == "example"
 
+    @pytest.mark.parametrize(
+        "matchers,result",
+        [
+            ([r"plugin (?P<version>\w+)"], create_pm(version="example")),
+            ([r"plugin (?P<name>\w+)"], create_pm(name="example")),
+            (["plugin", r"plugin (?P<version>\w+)"], create_pm(version="example")),
+            (["plugin", r"plugin (?P<other>\w+)"], create_pm(presence=True)),
+            (
+                [r"(?P<name>\w+) (?P<version>\w+)", r"plugin (?P<version>\w+)"],
+                create_pm(name="plugin", version="example"),
+            ),
+            (
+                [r"plugin (?P<version>\d+)?", "plugin"],
+                create_pm(),
+            ),
+            ([lambda v: "value"], create_pm(name="value", version="value")),
+            (["other"], create_pm()),
+        ],
+    )
+    def test_extract_info(self, matchers, result):
+        assert extract_info("plugin example", *matchers) == result
+
+    @pytest.mark.parametrize(
+        "matcher,result",
+        [
+            (r"plugin (?P<target>\w+)", "example"),
+            (r"plugin (?P<other>\w+)", None),
+            ("plugin example", "presence"),
+        ],
+    )
+    def test_extract_named_group_with_compiled_matcher(self, matcher, result):
+        compiled = compile_matcher("body", matcher)
+        assert (
+            extract_named_group(
+                "plugin example", "target", [compiled], return_presence=True
+            )
+            == result
+        )
+
+    @pytest.mark.parametrize(
+        "matcher_type,matcher",
+        [
+            ("url", "foo"),
+            ("body", "foo"),
+            ("header", ("Server", "foo")),
+            ("xpath", ("//a/text()", "foo")),
+        ],
+    )
+    def test_compile_matcher(self, matcher_type, matcher):
+        compiled = compile_matcher(matcher_type, matcher)
+
+        if matcher_type == "header":
+            assert compiled[0] == matcher[0]
+            compiled = compiled[1]
+        elif matcher_type == "xpath":
+            assert compiled[0].path == matcher[0]
+            compiled = compiled[1]
+
+        assert compiled.pattern == "foo"
+        assert compiled.flags & re.DOTALL
+
+    @pytest.mark.parametrize(
+        "matcher_type,matcher",
+        [
+            ("xpath", ("//a/text()", None)),
+            ("xpath", ("//a/text()",)),
+            ("dom", ("window.foo", "window.foo.version")),
+        ],
+    )
+    def test_compile_matcher_without_regex(self, matcher_type, matcher):
+        compiled = compile_matcher(matcher_type, matcher)
+
+        assert len(compiled) == len(matcher)
+        assert compiled[1:] == matcher[1:]
+
+    def test_compile_matcher_with_invalid_xpath(self):
+        assert compile_matcher("xpath", ("//a[",)) == ("//a[",)
+
+    @pytest.mark.parametrize(
+        "regex,warnings",
+        [
+            (r"foo-(?P<version>[\d\.]+)", []),
+            (r"(a+)+b", ["nested unbounded quantifiers"]),
+            (r"(?:\w+\s?)*x", ["nested unbounded quantifiers"]),
+            (r"(?:.+/)*foo", ["nested unbounded quantifiers"]),
+            (r"/js/([^/]+/)*foo\.js", []),
+            (r"jQuery UI (\w+ )+", []),
+            (r"(a{1,3})+", []),
+            (r".*foo", ["unanchored leading wildcard"]),
+            (r"(.*)foo", ["unanchored leading wildcard"]),
+            (r"^.*foo", []),
+            (r"foo.*bar", []),
+            (lambda v: v, []),
+        ],
+    )
+    def test_get_regex_warnings(self, regex, warnings):
+        assert get_regex_warnings(compile_matcher("body", regex)) == warnings
+
 
 class TestMatchers:
     version_re = r"foo-(?P<version>[\d\.]+)"
@@ -144,6 +257,54 @@ class TestMatchers:
         assert matcher_class.get_info(entry, matcher) == create_pm(name=name)
 
 
+class TestBodyMatcher:
+    @pytest.mark.parametrize(
+        "matcher,result",
+        [
+            (r"foo-(?P<version>[\d\.]+)", rb"foo-(?P<version>[\d\.]+)"),
+            (lambda v: v, None),
+            ("fóo", None),
+        ],
+    )
+    def test_get_bytes_regex(self, matcher, result):
+        regex = get_bytes_regex(compile_matcher("body", matcher))
+        assert (regex.pattern if regex else None) == result
+
+    @pytest.mark.parametrize(
+        "body,charset,version",
+        [
+            (b"foo-1.1", "utf-8", "1.1"),
+            ("fóo-1.1 foo-1.2".encode("latin-1"), "latin-1", "1.2"),
+            ("fóo-1.1 foo-1.2".encode("utf-8"), "utf-8", "1.2"),
+        ],
+    )
+    def test_get_info_with_body_bytes(self, body, charset, version):
+        entry = res_text(body.decode(charset))
+        entry["detectem"] = {"body": body, "charset": charset}
+        matcher = compile_matcher("body", r"foo-(?P<version>[\d\.]+)")
+
+        assert BodyMatcher.get_info(entry, matcher) == create_pm(version=version)
+
+    def test_get_info_with_oversized_body(self, monkeypatch, caplog):
+        monkeypatch.setattr(detectem.matchers, "MATCHER_MAX_INPUT_SIZE", 4)
+        entry = req_res_url("http://d.tld/foo.js")
+        entry["response"]["content"] = {"text": "foo-1.1"}
+        matcher = compile_matcher("body", r"foo-(?P<version>[\d\.]+)")
+
+        assert BodyMatcher.get_info(entry, matcher) == create_pm()
+        assert BodyMatcher.get_info(entry, matcher) == create_pm()
+        assert len(caplog.records) == 1
+        assert is_over_budget(entry)
+
+    def test_get_info_without_max_input_size(self):
+        entry = req_res_url("http://d.tld/foo.js")
+        entry["response"]["content"] = {"text": "foo-1.1" * 1024}
+        matcher = compile_matcher("body", r"foo-(?P<version>[\d\.]+)")
+
+        assert BodyMatcher.get_info(entry, matcher).version == "1.1"
+        assert not is_over_budget(entry)
+
+
 class TestUrlMatcher:
     @pytest.mark.parametrize(
         "entry",
@@ -155,3 +316,308 @@ class TestUrlMatcher:
     def test_get_version_with_har(self, entry):
         version_re = r"foo-(?P<version>[\d\.]+)"
         assert UrlMatcher.get_info(entry, version_re) == create_pm(version="1.1")
+
+
+class TestHeaderMatcher:
+    @pytest.mark.parametrize("header_name", ["Server", "server", "SERVER"])
+    def test_get_info_is_case_insensitive(self, header_name):
+        entry = {"response": {"headers": [{"name": header_name, "value": "foo-1.1"}]}}
+        matcher = ("Server", r"foo-(?P<version>[\d\.]+)")
+
+        assert HeaderMatcher.get_info(entry, matcher) == create_pm(version="1.1")
+
+    def test_get_info_with_many_values(self):
+        entry = {
+            "response": {
+                "headers": [
+                    {"name": "Server", "value": "bar"},
+                    {"name": "Server", "value": "foo-1.1"},
+                ]
+            }
+        }
+        matcher = ("Server", r"foo-(?P<version>[\d\.]+)")
+
+        assert HeaderMatcher.get_info(entry, matcher) == create_pm(version="1.1")
+
+
+class TestXPathMatcher:
+    def test_get_selector(self):
+        entry = res_text("<a>foo</a>")
+        assert get_selector(entry) is get_selector(entry)
+
+    @pytest.mark.parametrize(
+        "matcher,result",
+        [
+            (("//a/text()", r"foo-(?P<version>[\d\.]+)"), create_pm(version="1.1")),
+            (("//a",), create_pm(presence=True)),
+            (("count(//a)", "1"), create_pm(presence=True)),
+            (("//b",), create_pm()),
+        ],
+    )
+    def test_get_info_with_compiled_matcher(self, matcher, result):
+        entry = res_text("<a>foo-1.1</a>")
+        compiled = compile_matcher("xpath", matcher)
+
+        assert XPathMatcher.get_info(entry, compiled) == result
+        assert XPathMatcher.get_info(entry, matcher) == result
+
+
+class TestUrlMatcherEngine:
+    MATCHERS = [
+        r"foo-(?P<version>[\d\.]+)",
+        r"foo-(?P<name>[a-z]+)",
+        "foo",
+        r"(?P<name>bar)-(?P=name)",
+        lambda v: "callable" if "baz" in v else None,
+    ]
+
+    def _create_plugin(self, name, matchers):
+        class TestPlugin:
+            def get_matchers(self, matcher_type):
+                return matchers
+
+        plugin = TestPlugin()
+        plugin.name = name
+        return plugin
+
+    def _create_engine(self):
+        plugins = [
+            self._create_plugin(str(i), [m]) for i, m in enumerate(self.MATCHERS)
+        ]
+        plugins.append(self._create_plugin("all", self.MATCHERS[:-1]))
+        return UrlMatcherEngine(plugins), plugins
+
+    def test_handles(self):
+        engine, plugins = self._create_engine()
+
+        # Callables are always candidates, then every plugin is handled
+        assert all(engine.handles(p) for p in plugins)
+
+    @pytest.mark.parametrize(
+        "entry",
+        [
+            req_res_url("http://d.tld/foo-1.1"),
+            req_res_url("http://d.tld/foo-core"),
+            req_res_url("http://d.tld/foo"),
+            req_res_url("http://d.tld/bar-bar"),
+            req_res_url("http://d.tld/other"),
+            req_res_url("http://d.tld/baz"),
+            {"request": {"url": "http://d.tld/foo"}},
+            {
+                "request": {"url": "http://d.tld/foo"},
+                "response": {"url": "http://d.tld/foo-1.1"},
+            },
+        ],
+    )
+    @pytest.mark.parametrize("use_automaton", [True, False])
+    def test_get_info_follows_url_matcher(self, entry, use_automaton, monkeypatch):
+        if not use_automaton:
+            monkeypatch.setattr(detectem.matchers, "ahocorasick", None)
+
+        engine, plugins = self._create_engine()
+        matches = engine.get_info(entry)
+
+        for plugin in plugins:
+            expected = UrlMatcher.get_info(entry, *plugin.get_matchers("url"))
+            assert matches.get(plugin.name, create_pm()) == expected
+
+
+class TestBodyPrefilter:
+    def _create_plugin(self, name, matchers):
+        class TestPlugin:
+            def get_matchers(self, matcher_type):
+                return matchers
+
+        plugin = TestPlugin()
+        plugin.name = name
+        return plugin
+
+    @pytest.mark.parametrize(
+        "matcher,literal",
+        [
+            (r"/\*\!? jQuery v(?P<version>[0-9\.]+)", " jQuery v"),
+            (r"^//\s+Underscore\.js (?P<version>[0-9\.]+)", "Underscore.js "),
+            (r"(foo)+ ba", "foo"),
+            (r"(foo)* b", None),
+            (r"(foo|bar)", None),
+            (r"(?i)foobar", None),
+            (lambda v: v, None),
+        ],
+    )
+    def test_get_required_literal(self, matcher, literal):
+        assert get_required_literal(matcher) == literal
+
+    @pytest.mark.parametrize("use_automaton", [True, False])
+    def test_get_matchers(self, use_automaton, monkeypatch):
+        if not use_automaton:
+            monkeypatch.setattr(detectem.matchers, "ahocorasick", None)
+
+        version_re = r"Foo v(?P<version>[0-9\.]+)"
+        presence_re = "Bar library"
+        no_literal_re = r"\w+ v(?P<version>[0-9\.]+)"
+        plugins = [
+            self._create_plugin("foo", [version_re]),
+            self._create_plugin("bar", [presence_re, version_re]),
+            self._create_plugin("baz", [no_literal_re]),
+        ]
+        prefilter = BodyPrefilter(plugins)
+
+        assert prefilter.get_matchers("Foo v1.1") == {
+            "foo": [version_re],
+            "bar": [version_re],
+            "baz": [no_literal_re],
+        }
+        assert prefilter.get_matchers("Bar library") == {
+            "bar": [presence_re],
+            "baz": [no_literal_re],
+        }
+        assert prefilter.get_matchers(b"Bar library") == {
+            "bar": [presence_re],
+            "baz": [no_literal_re],
+        }
+
+
+class TestMatcherPlans:
+    class FooPlugin(Plugin):
+        name = "foo"
+        matchers = [
+            {"body": "foo"},
+            {"url": "foo"},
+            {"header": ("Server", "foo")},
+            {"dom": ("window.foo", None)},
+        ]
+
+    class BarPlugin(GenericPlugin):
+        name = "bar"
+        matchers = [{"xpath": ("//bar", None)}]
+
+    def test_get_plan(self):
+        foo, bar = self.FooPlugin(), self.BarPlugin()
+        plans = MatcherPlans([foo, bar])
+
+        assert plans.get_plan(RESOURCE_ENTRY) == (
+            (
+                foo,
+                (
+                    ("url", MATCHERS["url"], ("foo",)),
+                    ("body", MATCHERS["body"], ("foo",)),
+                ),
+            ),
+        )
+        assert plans.get_plan(RESOURCE_ENTRY, generic=True) == ()
+        assert plans.get_plan(MAIN_ENTRY) == (
+            (foo, (("header", MATCHERS["header"], (("Server", "foo"),)),)),
+        )
+        assert plans.get_plan(MAIN_ENTRY, generic=True) == (
+            (bar, (("xpath", MATCHERS["xpath"], (("//bar", None),)),)),
+        )
+
+    def test_get_plan_with_prerequisites(self):
+        class QuxPlugin(Plugin):
+            name = "qux"
+            prerequisites = ["foo"]
+            matchers = [{"body": "qux"}, {"url": "qux"}]
+
+        foo, qux = self.FooPlugin(), QuxPlugin()
+        plans = MatcherPlans([foo, qux])
+
+        assert plans.get_plan(RESOURCE_ENTRY)[1] == (
+            qux,
+            (("url", MATCHERS["url"], ("qux",)),),
+        )
+        assert plans.get_plan(RESOURCE_ENTRY, deferred=True) == (
+            (qux, (("body", MATCHERS["body"], ("qux",)),)),
+        )
+        assert plans.get_deferred_plugins({"foo"}) == {"qux"}
+        assert plans.get_deferred_plugins({"bar"}) == set()
+
+        # Prerequisites not in the plugins are ignored
+        plans = MatcherPlans([qux])
+        assert plans.get_plan(RESOURCE_ENTRY, deferred=True) == ()
+
+    def test_get_steps(self):
+        foo, bar = self.FooPlugin(), self.BarPlugin()
+        plans = MatcherPlans([foo, bar])
+
+        assert len(plans.get_steps(INLINE_SCRIPT_ENTRY, foo)) == 2
+        assert plans.get_steps(INLINE_SCRIPT_ENTRY, bar) == ()
+
+
+class TestEntryRouter:
+    class FooPlugin(Plugin):
+        name = "foo"
+        matchers = [{"url": "foo"}, {"body": "Foo library"}]
+
+    class BarPlugin(Plugin):
+        name = "bar"
+        matchers = [{"header": ("X-Bar", "bar")}]
+
+    class BazPlugin(Plugin):
+        name = "baz"
+        matchers = [{"body": lambda v: None}, {"xpath": ("//baz", None)}]
+
+    def _create_router(self):
+        plugins = PluginCollection()
+        for klass in [self.FooPlugin, self.BarPlugin, self.BazPlugin]:
+            plugin = klass()
+            plugin.compile_matchers()
+            plugins.add(plugin)
+
+        return plugins, plugins.get_entry_router()
+
+    @pytest.mark.parametrize(
+        "entry_type,features,plugin_names",
+        [
+            (RESOURCE_ENTRY, set(), []),
+            (RESOURCE_ENTRY, {("url", "foo")}, ["foo"]),
+            (RESOURCE_ENTRY, {("body", "foo"), ("body", "baz")}, ["foo", "baz"]),
+            (MAIN_ENTRY, set(), ["baz"]),
+            (MAIN_ENTRY, {("header", "x-bar")}, ["bar", "baz"]),
+        ],
+    )
+    def test_route(self, entry_type, features, plugin_names):
+        _, router = self._create_router()
+        plan = router.route(entry_type, features)
+
+        assert [plugin.name for plugin, _ in plan] == plugin_names
+
+    def test_route_deferred_plugins(self):
+        plugins, _ = self._create_router()
+        plugins.get("foo").prerequisites = ["bar"]
+        plans = MatcherPlans(plugins.get_all())
+        router = EntryRouter(
+            plans, plugins.get_url_engine(), plugins.get_body_prefilter()
+        )
+        features = {("url", "foo"), ("body", "foo")}
+
+        # Cheap URL step is applied first, body step once "bar" is detected
+        assert [
+            (p.name, [s[0] for s in steps])
+            for p, steps in router.route(RESOURCE_ENTRY, features)
+        ] == [("foo", ["url"])]
+        assert [
+            (p.name, [s[0] for s in steps])
+            for p, steps in router.route(RESOURCE_ENTRY, features, deferred=True)
+        ] == [("foo", ["body"])]
+
+    def test_get_features(self):
+        plugins, router = self._create_router()
+        url = "http://domain.tld/foo.js"
+        entry = {
+            "request": {"url": url},
+            "response": {
+                "url": url,
+                "headers": [{"name": "X-Bar", "value": "bar"}],
+                "content": {"text": "Foo library"},
+            },
+        }
+        url_matches = plugins.get_url_engine().get_info(entry)
+        body_matchers = plugins.get_body_prefilter().get_matchers("Foo library")
+
+        assert router.get_features(entry, url_matches, body_matchers) == {
+            ("header", "x-bar"),
+            ("url", "foo"),
+            ("body", "foo"),
+            # Body matchers without literals are always candidates
+            ("body", "baz"),
+        }
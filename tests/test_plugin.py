@@ -0,0 +1,122 @@
+import pytest
+
+from detectem.plugin import Plugin, PluginCollection, load_plugins, reset_plugins
+
+
+class TestPluginCollection:
+    def test_add_and_get(self):
+        class FooPlugin(Plugin):
+            name = "foo"
+
+        plugins = PluginCollection()
+        plugins.add(FooPlugin())
+
+        assert len(plugins) == 1
+        assert plugins.get("foo").name == "foo"
+
+    def test_add_on_frozen_collection(self):
+        class FooPlugin(Plugin):
+            name = "foo"
+
+        plugins = PluginCollection()
+        plugins.freeze()
+
+        assert plugins.frozen
+        with pytest.raises(RuntimeError):
+            plugins.add(FooPlugin())
+
+    def test_version(self):
+        class FooPlugin(Plugin):
+            name = "foo"
+            matchers = [{"url": "foo"}]
+
+        class BarPlugin(Plugin):
+            name = "bar"
+            matchers = [{"url": "bar"}]
+
+        plugins = PluginCollection()
+        plugins.add(FooPlugin())
+        version = plugins.version
+        assert version == plugins.version
+
+        plugins.add(BarPlugin())
+        assert plugins.version != version
+
+    def test_filter(self):
+        class FooPlugin(Plugin):
+            name = "foo"
+            tags = ["javascript"]
+
+        class BarPlugin(Plugin):
+            name = "bar"
+            tags = ["cms"]
+
+        class BazPlugin(Plugin):
+            name = "baz"
+            tags = ["analytics"]
+
+        plugins = PluginCollection()
+        for klass in [FooPlugin, BarPlugin, BazPlugin]:
+            plugins.add(klass())
+
+        filtered = plugins.filter(names=["foo"], tags=["cms"])
+        assert sorted(p.name for p in filtered.get_all()) == ["bar", "foo"]
+        assert filtered.frozen
+        assert filtered.is_excluded("baz")
+        assert not filtered.is_excluded("unknown")
+
+        # Filtered collections are reused
+        assert plugins.filter(names=["foo"], tags=["cms"]) is filtered
+
+        assert len(filtered.filter(tags=["javascript"])) == 1
+
+    def test_filter_cache_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(PluginCollection, "MAX_FILTERED_COLLECTIONS", 2)
+        plugins = PluginCollection()
+
+        first = plugins.filter(names=["foo"])
+        plugins.filter(names=["bar"])
+        assert plugins.filter(names=["foo"]) is first
+
+        plugins.filter(names=["baz"])
+        plugins.filter(names=["qux"])
+        assert len(plugins._filtered) == 2
+        assert plugins.filter(names=["foo"]) is not first
+
+
+class TestPlugin:
+    def test_compile_matchers(self):
+        class FooPlugin(Plugin):
+            name = "foo"
+            matchers = [
+                {"url": "foo"},
+                {"header": ("Server", "foo")},
+                {"dom": ("window.foo", None)},
+            ]
+
+        plugin = FooPlugin()
+        assert plugin.get_matchers("url") == ["foo"]
+
+        plugin.compile_matchers()
+        assert plugin.get_matchers("url")[0].pattern == "foo"
+        assert plugin.get_matchers("header")[0][1].pattern == "foo"
+        assert plugin.get_matchers("dom") == [("window.foo", None)]
+
+        # Class matchers aren't modified
+        assert FooPlugin.matchers[0] == {"url": "foo"}
+
+
+class TestLoadPlugins:
+    def test_registry_is_built_once(self):
+        assert load_plugins() is load_plugins()
+
+    def test_registry_is_frozen(self):
+        assert load_plugins().frozen
+
+    def test_reset_plugins(self):
+        plugins = load_plugins()
+        reset_plugins()
+
+        new_plugins = load_plugins()
+        assert new_plugins is not plugins
+        assert len(new_plugins) == len(plugins)
@@ -0,0 +1,41 @@
+from detectem.profiling import MatcherProfiler, get_scanned_bytes
+
+
+def test_get_scanned_bytes():
+    entry = {
+        "request": {"url": "http://d.tld/a.js"},
+        "response": {
+            "headers": [{"name": "Server", "value": "Apache"}],
+            "content": {"text": "foo"},
+        },
+    }
+
+    assert get_scanned_bytes("url", entry) == 17
+    assert get_scanned_bytes("header", entry) == 6
+    assert get_scanned_bytes("body", entry) == 3
+
+
+def test_matcher_profiler():
+    entry = {"request": {"url": "http://d.tld/"}, "response": {}}
+
+    profiler = MatcherProfiler()
+    profiler.record("foo", "body", 0.5, 10, hit=True)
+    profiler.record("foo", "body", 0.5, 10)
+    with profiler.measure("foo", "url", entry) as measure:
+        measure["hit"] = True
+
+    other = MatcherProfiler()
+    other.record("bar", "header", 1.0, 4)
+    profiler.merge(other.get_stats())
+
+    report = profiler.get_report()
+    assert report["foo"]["body"] == {
+        "calls": 2,
+        "time": 1.0,
+        "bytes": 20,
+        "hits": 1,
+        "hit_rate": 0.5,
+    }
+    assert report["foo"]["url"]["bytes"] == 13
+    assert report["foo"]["url"]["hits"] == 1
+    assert report["bar"]["header"]["hit_rate"] == 0
@@ -1,24 +1,44 @@
+import base64
+import hashlib
+import json
+import re
+import shutil
+import subprocess
+
 import pytest
 
 import detectem.utils
 from detectem.exceptions import SplashError
 from detectem.plugin import Plugin, PluginCollection
 from detectem.response import (
+    BLOCKED_URL_PARTS,
     DEFAULT_CHARSET,
     create_lua_script,
     get_charset,
     get_evaljs_error,
     get_response,
+    get_session,
     get_valid_har,
     is_url_allowed,
     is_valid_mimetype,
     requests,
 )
+from detectem.utils import (
+    get_response_body,
+    get_response_body_bytes,
+    get_response_body_hash,
+    is_response_body_decoded,
+)
 
 
 @pytest.mark.parametrize(
     "url,result",
-    [("http://domain.tld/font.ttf", False), ("http://domain.tld/index.html", True)],
+    [
+        ("http://domain.tld/font.ttf", False),
+        ("http://domain.tld/font.woff2", False),
+        ("https://fonts.googleapis.com/css?family=Foo", False),
+        ("http://domain.tld/index.html", True),
+    ],
 )
 def test_is_url_allowed(url, result):
     assert is_url_allowed(url) == result
@@ -58,6 +78,8 @@ def test_create_lua_script():
 
     script = create_lua_script(plugins)
     assert script
+    assert plugins.get_lua_script() == script
+    assert plugins.get_lua_script() is plugins.get_lua_script()
 
     assert '"name": "bla"' in script
     assert '"check_statement": "bla"' in script
@@ -71,11 +93,10 @@ def test_get_response(monkeypatch):
         def json(self):
             return {"har": {}, "softwares": [], "scripts": {}}
 
-    def __mock_requests_get(url, timeout=None):
+    def __mock_requests_post(self, url, data=None, headers=None, timeout=None):
         return TestResponse()
 
-    monkeypatch.setattr(requests, "get", __mock_requests_get)
-    monkeypatch.setattr(requests, "post", lambda v: v)
+    monkeypatch.setattr(requests.Session, "post", __mock_requests_post)
     monkeypatch.setattr(detectem.settings, "SETUP_SPLASH", False)
 
     response = get_response("http://domain.tld", PluginCollection())
@@ -84,6 +105,141 @@ def test_get_response(monkeypatch):
     assert "softwares" in response
 
 
+def test_get_response_sends_script_in_body(monkeypatch):
+    class TestResponse:
+        status_code = 200
+
+        def json(self):
+            return {"har": {}, "softwares": [], "scripts": {}}
+
+    requests_sent = []
+
+    def __mock_requests_post(self, url, data=None, headers=None, timeout=None):
+        requests_sent.append((url, json.loads(data)))
+        return TestResponse()
+
+    monkeypatch.setattr(requests.Session, "post", __mock_requests_post)
+
+    plugins = PluginCollection()
+    get_response("http://domain.tld", plugins, 10, "http://splash:8050", 1, 3)
+
+    assert requests_sent == [
+        (
+            "http://splash:8050/execute",
+            {
+                "url": "http://domain.tld",
+                "timeout": 10,
+                "min_wait": 1,
+                "max_wait": 3,
+                "blocked_urls": BLOCKED_URL_PARTS,
+                "blocked_mimetypes": ["image/"],
+                "full_har": False,
+                "lua_source": plugins.get_lua_script(),
+            },
+        )
+    ]
+
+
+@pytest.mark.parametrize(
+    "min_wait,max_wait,sent",
+    [
+        (1, 3, (1, 3)),
+        (0.5, 0.5, (0.5, 0.5)),
+        (2, 1, (2, 2)),
+        (0, 0, (0, 0)),
+    ],
+)
+def test_get_response_clamps_max_wait(monkeypatch, min_wait, max_wait, sent):
+    class TestResponse:
+        status_code = 200
+
+        def json(self):
+            return {"har": {}, "softwares": [], "scripts": {}}
+
+    requests_sent = []
+
+    def __mock_requests_post(self, url, data=None, headers=None, timeout=None):
+        requests_sent.append(json.loads(data))
+        return TestResponse()
+
+    monkeypatch.setattr(requests.Session, "post", __mock_requests_post)
+
+    get_response(
+        "http://domain.tld", PluginCollection(), min_wait=min_wait, max_wait=max_wait
+    )
+
+    assert [(r["min_wait"], r["max_wait"]) for r in requests_sent] == [sent]
+
+
+def run_is_settled(polls):
+    """Run ``isSettled()`` of the Lua script in Node.js for every poll
+    of ``polls`` and return its results.
+
+    """
+
+    class FooPlugin(Plugin):
+        name = "foo"
+        matchers = [{"dom": ("window.foo", "window.foo.version")}]
+
+    plugins = PluginCollection()
+    plugins.add(FooPlugin())
+    script = create_lua_script(plugins)
+
+    functions = re.findall(r"local \w+Function = \[\[(.*?)\]\]", script, re.S)
+    software_data = re.search(r"runjs\('(softwareData = .*?;)'\)", script).group(1)
+    program = "\n".join(
+        [
+            "var window = globalThis;",
+            "var document = {};",
+            software_data,
+            *functions,
+            f"var polls = {json.dumps(polls)};",
+            "console.log(JSON.stringify(polls.map(function(p) {",
+            "  document.readyState = p.state;",
+            "  window.foo = p.version ? {version: p.version} : undefined;",
+            "  return isSettled(p.pending, p.idle);",
+            "})));",
+        ]
+    )
+
+    output = subprocess.run(
+        ["node", "-e", program], capture_output=True, check=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def poll(state="complete", pending=0, idle=False, version=None):
+    return {"state": state, "pending": pending, "idle": idle, "version": version}
+
+
+@pytest.mark.skipif(not shutil.which("node"), reason="Node.js is not installed")
+@pytest.mark.parametrize(
+    "polls,result",
+    [
+        # Network idle
+        ([poll(idle=True)], [True]),
+        ([poll(state="interactive", idle=True)], [False]),
+        ([poll(pending=1, idle=True)], [False]),
+        # Stable detections without requests in flight
+        ([poll(version="1.0"), poll(version="1.0")], [False, True]),
+        ([poll(version="1.0"), poll(version="1.0", pending=2)], [False, False]),
+        ([poll(version="1.0"), poll(version="1.1")], [False, False]),
+        # Nothing detected yet while the network is busy
+        ([poll(), poll(), poll()], [False, False, False]),
+    ],
+)
+def test_is_settled(polls, result):
+    assert run_is_settled(polls) == result
+
+
+def test_get_session():
+    session = get_session("http://splash:8050")
+
+    assert get_session("http://splash:8050") is session
+    assert get_session("http://splash:8051") is not session
+    assert session.get_adapter("http://splash:8050").max_retries.read == 0
+
+
 def test_get_response_with_error_status_codes(monkeypatch):
     class TestResponse:
         status_code = 504
@@ -91,11 +247,10 @@ def test_get_response_with_error_status_codes(monkeypatch):
         def json(self):
             return {"description": "error 100"}
 
-    def __mock_requests_get(url, timeout=None):
+    def __mock_requests_post(self, url, data=None, headers=None, timeout=None):
         return TestResponse()
 
-    monkeypatch.setattr(requests, "get", __mock_requests_get)
-    monkeypatch.setattr(requests, "post", lambda v: v)
+    monkeypatch.setattr(requests.Session, "post", __mock_requests_post)
     monkeypatch.setattr(detectem.settings, "SETUP_SPLASH", False)
 
     with pytest.raises(SplashError):
@@ -108,6 +263,8 @@ def test_get_response_with_error_status_codes(monkeypatch):
         ({}, 0),
         ({"log": {}}, 0),
         ({"log": {"entries": []}}, 0),
+        # Empty Lua tables are returned as JSON objects
+        ({"log": {"entries": {}}}, 0),
         (
             {
                 "log": {
@@ -164,6 +321,38 @@ def test_get_valid_har(har_data, result_len):
     assert len(get_valid_har(har_data)) == result_len
 
 
+def test_get_valid_har_lazy_decoding():
+    body = "fóo".encode("latin-1")
+    har_data = {
+        "log": {
+            "entries": [
+                {
+                    "request": {"url": "http://domain.tld/foo.js"},
+                    "response": {
+                        "content": {
+                            "mimeType": "text/javascript;charset=latin-1",
+                            "text": base64.b64encode(body).decode("ascii"),
+                        }
+                    },
+                }
+            ]
+        }
+    }
+    entry = get_valid_har(har_data)[0]
+    assert not is_response_body_decoded(entry)
+
+    assert get_response_body_bytes(entry) == body
+    assert not is_response_body_decoded(entry)
+
+    assert get_response_body(entry) == "fóo"
+    assert is_response_body_decoded(entry)
+    assert entry["response"]["content"]["text"] == "fóo"
+
+    # Only the text is kept, the hash is of the original bytes
+    assert "body" not in entry["detectem"]
+    assert get_response_body_hash(entry) == hashlib.sha256(body).hexdigest()
+
+
 def test_get_evaljs_error():
     json_data = {
         "errors": {
@@ -1,6 +1,16 @@
+import hashlib
+
 import pytest
 
-from detectem.utils import get_url
+from detectem.utils import (
+    FileHashIndex,
+    SortedIndex,
+    get_ascii_response_body,
+    get_response_body_bytes,
+    get_response_body_hash,
+    get_response_headers,
+    get_url,
+)
 
 
 @pytest.mark.parametrize(
@@ -12,3 +22,98 @@ from detectem.utils import get_url
 )
 def test_get_url(entry, result):
     assert get_url(entry) == result
+
+
+@pytest.mark.parametrize(
+    "key,result",
+    [
+        ("simpleshop", "Dallas Read"),
+        ("mediavine-amp-redirect", "mediavine"),
+        ("", None),
+    ],
+)
+def test_sorted_index(key, result):
+    index = SortedIndex("data/wordpress.idx")
+    assert index.get(key) == result
+
+
+def test_get_response_headers():
+    entry = {
+        "response": {
+            "headers": [
+                {"name": "Server", "value": "Apache"},
+                {"name": "set-cookie", "value": "a=1"},
+                {"name": "Set-Cookie", "value": "b=2"},
+                {"name": "invalid"},
+            ]
+        }
+    }
+    headers = get_response_headers(entry)
+
+    assert headers == {"server": ["Apache"], "set-cookie": ["a=1", "b=2"]}
+    assert get_response_headers(entry) is headers
+
+
+class FakeHashDatabase:
+    checksum = "fake"
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, file_hash):
+        return self.data.get(file_hash, [])
+
+
+def test_file_hash_index():
+    class FooPlugin:
+        name = "foo"
+        file_hashes = {"/foo.js": {"1.0": "aaa", "1.1": "aaa", "2.0": "bbb"}}
+
+    class BarPlugin:
+        name = "bar"
+
+    database = FakeHashDatabase(
+        {"bbb": [("bar", "3.0")], "ccc": [("bar", "3.1"), ("baz", "1.0")]}
+    )
+    index = FileHashIndex([FooPlugin(), BarPlugin()], database=database)
+
+    assert index.get("aaa") == {"foo": "1.0"}
+    assert index.get("bbb") == {"foo": "2.0", "bar": "3.0"}
+    # baz plugin isn't in the collection
+    assert index.get("ccc") == {"bar": "3.1"}
+    assert index.get("ddd") == {}
+
+
+@pytest.mark.parametrize(
+    "body,charset,result",
+    [
+        (b"foo", "utf-8", b"foo"),
+        (b"foo", "latin-1", b"foo"),
+        ("fo".encode("utf-16-le"), "utf-16-le", None),
+        ("fóo".encode("latin-1"), "latin-1", None),
+    ],
+)
+def test_get_ascii_response_body(body, charset, result):
+    entry = {
+        "response": {"content": {"text": body.decode(charset)}},
+        "detectem": {"body": body, "charset": charset},
+    }
+    assert get_ascii_response_body(entry) == result
+
+
+def test_get_response_body_hash():
+    body = "fóo".encode("latin-1")
+    entry = {
+        "response": {"content": {"text": body.decode("latin-1")}},
+        "detectem": {"body": body, "charset": "latin-1"},
+    }
+
+    # Hash of the original file
+    assert get_response_body_hash(entry) == hashlib.sha256(body).hexdigest()
+
+    # Entries without bytes (e.g. inline scripts) use UTF-8
+    entry = {"response": {"content": {"text": "fóo"}}}
+    assert get_response_body_bytes(entry) == "fóo".encode("utf-8")
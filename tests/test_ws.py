@@ -33,3 +33,27 @@ def test_do_detection_with_noplugins_exception(gdr):
 
     with boddle(method="post", params={"url": "http://domain.tld"}):
         assert do_detection() == json.dumps({"error": "No plugins"})
+
+
+@patch("detectem.ws.get_detection_results", autospec=True)
+def test_do_detection_with_plugins_and_tags(gdr):
+    gdr.return_value = []
+    params = {"url": "http://domain.tld", "plugins": "jquery, vue", "tags": "cms"}
+
+    with boddle(method="post", params=params):
+        do_detection()
+
+    assert gdr.call_args[1]["plugin_names"] == ["jquery", "vue"]
+    assert gdr.call_args[1]["tags"] == ["cms"]
+
+
+@patch("detectem.ws.get_detection_results", autospec=True)
+def test_do_detection_with_invalid_plugins_and_tags(gdr):
+    for params, error in [
+        ({"plugins": "jquery, invalid"}, "Invalid plugin: invalid"),
+        ({"tags": "invalid"}, "Invalid tag: invalid"),
+    ]:
+        with boddle(method="post", params=dict(params, url="http://domain.tld")):
+            assert do_detection() == json.dumps({"error": error})
+
+    assert not gdr.called